@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+
+import construct
+
+from prodj.core.benchmark import Parsers, ResultFormatVersion, add_capture_to_corpus, build_corpus, compare_results, run_benchmark
+from prodj.core.compiled import set_compiled_mode
+
+parser = argparse.ArgumentParser(description='Benchmark Python ProDJ Link packet parsing')
+parser.add_argument('-c', '--capture', action='append', default=[], help='Add the packets of a capture file to the corpus (may be given multiple times)')
+parser.add_argument('-p', '--parser', action='append', choices=list(Parsers), help='Only benchmark this parser (may be given multiple times)')
+parser.add_argument('-t', '--time', type=float, default=0.2, help='Minimum time in seconds to parse each corpus (default: 0.2)')
+parser.add_argument('--compiled', action='store_true', help='Use compiled construct structs')
+parser.add_argument('-o', '--output', help='Write the results as json to this file')
+parser.add_argument('--compare', help='Compare packets per second to the results of a previous run')
+parser.add_argument('-q', '--quiet', action='store_const', dest='loglevel', const=logging.WARNING, help='Display warning messages only', default=logging.INFO)
+args = parser.parse_args()
+
+logging.basicConfig(level=args.loglevel, format='%(levelname)s: %(message)s')
+
+def git_commit():
+  try:
+    return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+set_compiled_mode(args.compiled)
+corpus = build_corpus()
+for i, filename in enumerate(args.capture):
+  add_capture_to_corpus(corpus, filename, "capture{}".format(i))
+
+results = run_benchmark(corpus, args.time, args.parser)
+for r in results:
+  logging.info("{:22} {:28} {:9} packets/s {:6.1f} blocks {:7} bytes peak".format(
+    r["parser"], r["corpus"], r["packets_per_second"], r["blocks_per_packet"], r["peak_bytes_per_packet"]))
+
+report = {
+  "version": ResultFormatVersion,
+  "commit": git_commit(),
+  "python": platform.python_version(),
+  "construct": construct.__version__,
+  "compiled": args.compiled,
+  "results": results
+}
+if args.output:
+  with open(args.output, "w") as f:
+    json.dump(report, f, indent=2)
+
+if args.compare:
+  with open(args.compare) as f:
+    baseline = json.load(f)
+  logging.info("Compared to %s:", baseline.get("commit") or args.compare)
+  for parser_name, corpus_name, ratio in compare_results(baseline["results"], results):
+    logging.info("{:22} {:28} {:6.2f}x".format(parser_name, corpus_name, ratio))
@@ -41,25 +41,26 @@ p.cl.log_played_tracks = False
 p.cl.auto_request_beatgrid = False
 
 bpm = 128 # default bpm until reported from player
-beat = 0
 c.setBpm(bpm)
 
-def update_master(player_number):
-  global bpm, beat, p
-  client = p.cl.getClient(player_number)
-  if client is None or not 'master' in client.state:
-    return
-  if (args.notes or args.single_notes) and beat != client.beat:
-    note = args.base_note
+# state changes when a player becomes master
+def update_master(player_number, changes):
+  global bpm, p
+  client = p.cl.snapshot.getClient(player_number)
+  if (args.notes or args.single_note) and "beat" in changes:
+    note = args.note_base
     if args.notes:
-      note += client.beat
+      note += changes["beat"][1]
     c.send_note(note)
+  if client is None or client.bpm in [None, "-"]: # no track loaded
+    return
   newbpm = client.bpm*client.actual_pitch
   if bpm != newbpm:
     c.setBpm(newbpm)
     bpm = newbpm
 
-p.set_client_change_callback(update_master)
+# handled outside the network thread, beats must not be combined thus the oldest changes are dropped on overflow
+p.subscribe_client_changes(p.dispatch(update_master, "midi"), ["bpm", "actual_pitch", "beat", "state"], master=True)
 
 try:
   p.start()
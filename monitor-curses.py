@@ -24,23 +24,26 @@ ch.setFormatter(logging.Formatter(fmt='%(levelname)s: %(message)s'))
 logging.basicConfig(level=default_loglevel, handlers=[ch])
 
 p = ProDj()
-p.set_client_keepalive_callback(lambda n: update_clients(client_win))
-p.set_client_change_callback(lambda n: update_clients(client_win))
+# redraw in a separate thread at most 10 times per second per player
+redraw = p.throttle(lambda n: update_clients(client_win), 10, "redraw")
+p.set_client_keepalive_callback(redraw)
+p.set_client_change_callback(redraw)
 
 def update_clients(client_win):
   try:
     client_win.clear()
     client_win.addstr(0, 0, "Detected Pioneer devices:\n")
-    if len(p.cl.clients) == 0:
+    snapshot = p.cl.snapshot
+    if len(snapshot) == 0:
       client_win.addstr("  No devices detected\n")
     else:
-      for c in p.cl.clients:
+      for c in snapshot:
         client_win.addstr("Player {}: {} {} BPM Pitch {:.2f}% Beat {}/{} NextCue {}\n".format(
           c.player_number, c.model if c.fw=="" else "{}({})".format(c.model,c.fw),
           c.bpm, (c.pitch-1)*100, c.beat, c.beat_count, c.cue_distance))
         if c.status_packet_received:
           client_win.addstr("  {} ({}) Track {} from Player {},{} Actual Pitch {:.2f}%\n".format(
-            c.play_state, ",".join(c.state), c.track_number, c.loaded_player_number,
+            c.play_state, str(c.state), c.track_number, c.loaded_player_number,
             c.loaded_slot, (c.actual_pitch-1)*100))
     client_win.refresh()
   except Exception as e:
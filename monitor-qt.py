@@ -9,6 +9,7 @@ import argparse
 
 from prodj.core.prodj import ProDj
 from prodj.gui.gui import Gui
+from prodj.network.capture import PacketRecorder
 
 def arg_size(value):
   number = int(value)
@@ -33,17 +34,26 @@ parser.add_argument('-d', '--debug', action='store_const', dest='loglevel', cons
 parser.add_argument('--dump-packets', action='store_const', dest='loglevel', const=0, help='Dump packet fields for debugging', default=logging.INFO)
 parser.add_argument('--chunk-size', dest='chunk_size', help='Chunk size of NFS downloads (high values may be faster but fail on some networks)', type=arg_size, default=None)
 parser.add_argument('-f', '--fullscreen', action='store_true', help='Start with fullscreen window')
+parser.add_argument('--record', dest='record', help='Record all received packets to a capture file (see replay.py)', default=None)
+parser.add_argument('--pipeline', action='store_true', help='Receive and process packets in separate threads, slow GUI updates do not delay receiving')
+parser.add_argument('-i', '--iface', dest='iface', help='Only use the given network interface instead of guessing it', default=None)
 parser.add_argument('-l', '--layout', dest='layout', help='Display layout, values are xy (default), yx, xx, yy, row or column', type=arg_layout, default="xy")
 
 args = parser.parse_args()
 
 logging.basicConfig(level=args.loglevel, format='%(levelname)-7s %(module)s: %(message)s')
 
-prodj = ProDj()
+prodj = ProDj(iface=args.iface)
 prodj.data.pdb_enabled = args.enable_pdb
 prodj.data.dbc_enabled = args.enable_dbc
+prodj.pipelined = args.pipeline
 if args.chunk_size is not None:
   prodj.nfs.setDownloadChunkSize(args.chunk_size)
+if args.record is not None:
+  prodj.recorder = PacketRecorder(args.record)
+if args.loglevel == 0: # --dump-packets
+  prodj.enable_tracing()
+  prodj.trace.log_level = 5
 app = QApplication([])
 gui = Gui(prodj, show_color_waveform=args.color_waveform or args.color, show_color_preview=args.color_preview or args.color, arg_layout=args.layout)
 if args.fullscreen:
@@ -62,7 +72,7 @@ app.setPalette(pal)
 signal.signal(signal.SIGINT, lambda s,f: app.quit())
 
 prodj.set_client_keepalive_callback(gui.keepalive_callback)
-prodj.set_client_change_callback(gui.client_change_callback)
+prodj.set_client_change_callback(prodj.throttle(gui.client_change_callback, 60, "gui"))
 prodj.set_media_change_callback(gui.media_callback)
 prodj.start()
 prodj.vcdj_set_player_number(5)
@@ -71,3 +81,5 @@ prodj.vcdj_enable()
 app.exec()
 logging.info("Shutting down...")
 prodj.stop()
+if prodj.recorder is not None:
+  prodj.recorder.close()
@@ -0,0 +1,161 @@
+import logging
+import math
+import time
+import traceback
+from threading import Condition, Thread
+
+# beat phase of a player, estimated from its beat packets which are sent on every beat
+# arrival times only suffer from additional network delay, thus arrivals earlier than predicted
+# are trusted fully while later ones are only followed partially
+class BeatPhase:
+  def __init__(self):
+    self.gain = 0.25 # part of a late arrival the phase follows
+    self.timeout = 4 # number of beats without beat packets until the player is considered stopped
+    self.reset()
+
+  def reset(self):
+    self.beat_time = None # estimated time.monotonic() of the last beat
+    self.interval = None # seconds between beats at the current tempo and pitch
+    self.beats_to_bar = None # number of beats from beat_time to the next downbeat, 1..4
+
+  # next_beat and next_bar are the distances of the beat packet in seconds, None if unknown
+  def update(self, timestamp, next_beat, next_bar):
+    if next_beat is None or next_beat <= 0:
+      self.reset()
+      return
+    predicted = self.beat_time+self.interval if self.beat_time is not None else None
+    if predicted is not None and abs(timestamp-predicted) < self.interval/4:
+      error = timestamp-predicted
+      self.beat_time = predicted+(error if error < 0 else self.gain*error)
+    else: # first beat or beats skipped (e.g. jumped to a cue point)
+      self.beat_time = timestamp
+    self.interval = next_beat
+    beats_to_bar = round(next_bar/next_beat) if next_bar is not None else None
+    self.beats_to_bar = beats_to_bar if beats_to_bar in range(1, 5) else None
+
+  def valid(self, now):
+    return self.beat_time is not None and now-self.beat_time <= self.timeout*self.interval
+
+  # returns the time of the count-th beat (or downbeat if bar is True) after now, None if unknown
+  def predict(self, now, count=1, bar=False):
+    if not self.valid(now):
+      return None
+    if bar:
+      if self.beats_to_bar is None:
+        return None
+      first, step = self.beat_time+self.beats_to_bar*self.interval, 4*self.interval
+    else:
+      first, step = self.beat_time+self.interval, self.interval
+    skip = 0 if first > now else math.floor((now-first)/step)+1
+    return first+(skip+count-1)*step
+
+  # returns the beat in bar (1..4) of a predicted beat time, None if unknown
+  def beat_at(self, beat_time):
+    if self.beat_time is None or self.beats_to_bar is None:
+      return None
+    return (4-self.beats_to_bar+round((beat_time-self.beat_time)/self.interval))%4+1
+
+# predicts the time of the count-th next beat (or downbeat if bar is True) of client after now
+# on the time.monotonic() clock, from its beat phase or, if there are no recent beat packets, its beatgrid
+# returns None if the beats of the player are unknown (e.g. not playing)
+def predict_beat_time(prodj, client, count=1, bar=False, now=None):
+  if now is None:
+    now = time.monotonic()
+  beat_time = client.beat_phase.predict(now, count, bar)
+  if beat_time is None:
+    beat_time = predict_beat_time_by_beatgrid(prodj, client, count, bar, now)
+  return beat_time
+
+def predict_beat_time_by_beatgrid(prodj, client, count, bar, now):
+  position = client.playhead.position_at(now)
+  if client.play_state != "playing" or position is None or client.actual_pitch <= 0:
+    return None
+  identifier = (client.loaded_player_number, client.loaded_slot, client.track_id)
+  if identifier not in prodj.data.beatgrid_store:
+    return None
+  beatgrid = prodj.data.beatgrid_store[identifier]
+  if beatgrid is None:
+    return None
+  for beat in beatgrid:
+    if beat["time"]/1000 <= position or (bar and beat["beat"] != 1):
+      continue
+    count -= 1
+    if count == 0:
+      return now+(beat["time"]/1000-position)/client.actual_pitch
+  return None
+
+class BeatSubscription:
+  def __init__(self, callback, player_number, bar, lead_time):
+    self.callback = callback
+    self.player_number = player_number # None follows the tempo master
+    self.bar = bar
+    self.lead_time = lead_time
+    self.last_beat_time = None
+
+# calls subscribers on the predicted beats of players, see ProDj.subscribe_beats
+class BeatTicker(Thread):
+  def __init__(self, prodj):
+    super().__init__()
+    self.prodj = prodj
+    self.subscriptions = []
+    self.condition = Condition()
+    self.keep_running = True
+    self.poll_interval = 0.05 # seconds between checking for players starting to play or tempo changes
+    self.max_delay = 0.01 # seconds a tick may be late before it is skipped
+
+  def subscribe(self, callback, player_number=None, bar=False, lead_time=0):
+    subscription = BeatSubscription(callback, player_number, bar, lead_time)
+    with self.condition:
+      self.subscriptions = self.subscriptions+[subscription]
+      self.condition.notify()
+    return subscription
+
+  def unsubscribe(self, subscription):
+    with self.condition:
+      self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+  def stop(self):
+    with self.condition:
+      self.keep_running = False
+      self.condition.notify()
+
+  def run(self):
+    logging.debug("beat ticker started")
+    try:
+      while self.keep_running:
+        now = time.monotonic()
+        wakeup = now+self.poll_interval
+        for subscription in self.subscriptions:
+          tick_time = self.tick(subscription, now)
+          if tick_time is not None and tick_time < wakeup:
+            wakeup = tick_time
+        with self.condition:
+          if self.keep_running:
+            self.condition.wait(max(0, wakeup-time.monotonic()))
+    except Exception as e:
+      logging.critical("Exception in beats.run: "+str(e)+"\n"+traceback.format_exc())
+    logging.debug("beat ticker stopped")
+
+  # fires the subscription if its next beat is due, returns the time of the following tick
+  def tick(self, subscription, now):
+    if subscription.player_number is None:
+      client = self.prodj.cl.getMaster()
+    else:
+      client = self.prodj.cl.getClient(subscription.player_number)
+    if client is None:
+      return None
+    after = now+subscription.lead_time-self.max_delay
+    phase = client.beat_phase
+    if subscription.last_beat_time is not None: # do not fire the same beat twice if the prediction moved
+      after = max(after, subscription.last_beat_time+(phase.interval/2 if phase.interval is not None else 0.1))
+    beat_time = predict_beat_time(self.prodj, client, bar=subscription.bar, now=after)
+    if beat_time is None:
+      return None
+    if beat_time-subscription.lead_time > now:
+      return beat_time-subscription.lead_time
+    subscription.last_beat_time = beat_time
+    try:
+      subscription.callback(client.player_number, beat_time, phase.beat_at(beat_time))
+    except Exception as e:
+      logging.error("Exception in beat callback: "+str(e)+"\n"+traceback.format_exc())
+    return self.tick(subscription, now)
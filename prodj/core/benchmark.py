@@ -0,0 +1,196 @@
+# packet parsing benchmark on a corpus of synthetic packets (built with the player simulator)
+# and optionally captured packets, results are plain dicts to be dumped as json for
+# comparing different commits, see benchmark.py
+
+import time
+import tracemalloc
+
+from prodj.core.simulator import SimulatedPlayer
+from prodj.network import packets, packets_fast, packets_nfs
+from prodj.network.capture import read_capture
+
+ResultFormatVersion = 1
+
+# parser name -> parse function
+Parsers = {
+  "KeepAlivePacket": packets.KeepAlivePacket.parse,
+  "BeatPacket": packets.BeatPacket.parse,
+  "StatusPacket": packets.StatusPacket.parse,
+  "DBMessage": packets.DBMessage.parse,
+  "RpcMsg": packets_nfs.RpcMsg.parse,
+  "fast.KeepAlivePacket": packets_fast.parse_keepalive_packet,
+  "fast.BeatPacket": packets_fast.parse_beat_packet,
+  "fast.StatusPacket": packets_fast.parse_status_packet
+}
+
+# parsers used for captured packets by udp port
+CaptureParsers = {
+  50000: ["KeepAlivePacket", "fast.KeepAlivePacket"],
+  50001: ["BeatPacket", "fast.BeatPacket"],
+  50002: ["StatusPacket", "fast.StatusPacket"]
+}
+
+CorpusModels = ["CDJ-2000", "CDJ-2000NXS2", "CDJ-3000"]
+
+# returns the packets a playing simulated player sends within duration seconds as (port, data)
+def simulate_player(model, duration=2):
+  player = SimulatedPlayer(2, "192.168.1.2", model)
+  sent = []
+  player.send = lambda data, port: sent.append((port, data))
+  player.load_track(1)
+  player.play()
+  now = 0
+  while now < duration:
+    player.update(now)
+    now += 0.01
+  return sent
+
+def build_db_messages():
+  menu_request = packets.DBMessage.build({
+    "transaction_id": 1,
+    "type": "root_menu_request",
+    "args": [
+      {"type": "int32", "value": 5<<24 | 1<<16 | 3<<8 | 1},
+      {"type": "int32", "value": 0},
+      {"type": "int32", "value": 0xffffff}
+    ]
+  })
+  menu_item = packets.DBMessage.build({
+    "transaction_id": 2,
+    "type": "menu_item",
+    "args": [
+      {"type": "int32", "value": 0},
+      {"type": "int32", "value": 22},
+      {"type": "int32", "value": 20},
+      {"type": "string", "value": "\ufffaARTIST\ufffb"},
+      {"type": "int32", "value": 2},
+      {"type": "string", "value": ""},
+      {"type": "int32", "value": 149}
+    ] + [{"type": "int32", "value": 0}]*5
+  })
+  return [menu_request, menu_item]
+
+def build_rpc_messages():
+  call = packets_nfs.RpcMsg.build({
+    "xid": 1,
+    "type": "call",
+    "content": {
+      "prog": "nfs",
+      "proc": "lookup",
+      "vers": 2,
+      "cred": {"flavor": "unix", "content": {"stamp": 0x967b8703}},
+      "verf": {"flavor": "null", "content": None}
+    }
+  })
+  reply = packets_nfs.RpcMsg.build({
+    "xid": 1,
+    "type": "reply",
+    "content": {
+      "reply_stat": "accepted",
+      "content": {
+        "verf": {"flavor": "null", "content": None},
+        "accept_stat": "success",
+        "content": bytes(100)
+      }
+    }
+  })
+  return [call, reply]
+
+# returns a dict of corpus name -> (parser names, list of packets)
+def build_corpus():
+  corpus = {}
+  for model in CorpusModels:
+    sent = simulate_player(model)
+    keepalives = [data for port, data in sent if port == 50000]
+    beats = [data for port, data in sent if port == 50001 and data[10] == 0x28]
+    absolute_positions = [data for port, data in sent if port == 50001 and data[10] == 0x0b]
+    status = [data for port, data in sent if port == 50002]
+    corpus["keepalive/"+model] = (CaptureParsers[50000], keepalives)
+    corpus["beat/"+model] = (CaptureParsers[50001], beats)
+    if absolute_positions:
+      corpus["absolute_position/"+model] = (CaptureParsers[50001], absolute_positions)
+    corpus["status/"+model] = (CaptureParsers[50002], status)
+  corpus["mixer/DJM-900nexus"] = (CaptureParsers[50001], [packets.BeatPacket.build({
+    "type": "type_mixer", "subtype": "stype_mixer", "model": "DJM-900nexus", "player_number": 33,
+    "content": {"ch_on_air": [1, 0, 1, 0]}})])
+  corpus["status/DJM-900nexus"] = (CaptureParsers[50002], [packets.StatusPacket.build({
+    "type": "djm", "model": "DJM-900nexus", "player_number": 33, "extra": {"remaining_bytes": 0x14},
+    "content": {"state": {"master": True}, "physical_pitch": 1, "bpm": 128, "beat": 1}})])
+  corpus["dbmessage"] = (["DBMessage"], build_db_messages())
+  corpus["rpc"] = (["RpcMsg"], build_rpc_messages())
+  return corpus
+
+# adds the packets of a capture file (see capture.py) to corpus, grouped by port
+def add_capture_to_corpus(corpus, filename, name="capture"):
+  by_port = {}
+  for timestamp, port, data, addr in read_capture(filename):
+    if port in CaptureParsers:
+      by_port.setdefault(port, []).append(data)
+  for port, datas in by_port.items():
+    corpus["{}/{}".format(name, port)] = (CaptureParsers[port], datas)
+
+# packets per second, parsing the corpus repeatedly for at least min_time seconds
+def measure_speed(parse, datas, min_time):
+  count = 0
+  start = time.perf_counter()
+  while True:
+    for data in datas:
+      parse(data)
+    count += len(datas)
+    elapsed = time.perf_counter()-start
+    if elapsed >= min_time:
+      return count/elapsed
+
+# tracemalloc does not count allocations, thus two figures are reported:
+# memory blocks still allocated by a parsed packet (the result and anything it references)
+# and peak memory in bytes while parsing a packet, including temporary allocations
+def measure_allocations(parse, datas):
+  tracemalloc.start()
+  try:
+    results = []
+    before = tracemalloc.take_snapshot()
+    for data in datas:
+      results.append(parse(data))
+    after = tracemalloc.take_snapshot()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    peak = 0
+    for data in datas:
+      tracemalloc.reset_peak()
+      current = tracemalloc.get_traced_memory()[0]
+      parse(data)
+      peak += tracemalloc.get_traced_memory()[1]-current
+  finally:
+    tracemalloc.stop()
+  # one block is the results list entry
+  return max(blocks/len(datas)-1, 0), peak/len(datas)
+
+def run_benchmark(corpus, min_time=0.2, parsers=None):
+  results = []
+  for name, (parser_names, datas) in corpus.items():
+    if not datas:
+      continue
+    for parser_name in parser_names:
+      if parsers is not None and parser_name not in parsers:
+        continue
+      parse = Parsers[parser_name]
+      packets_per_second = measure_speed(parse, datas, min_time)
+      blocks, peak_bytes = measure_allocations(parse, datas)
+      results.append({
+        "parser": parser_name,
+        "corpus": name,
+        "packets": len(datas),
+        "packets_per_second": round(packets_per_second),
+        "blocks_per_packet": round(blocks, 1),
+        "peak_bytes_per_packet": round(peak_bytes)
+      })
+  return results
+
+# returns (parser, corpus, packets_per_second ratio) for all results contained in both lists
+def compare_results(baseline, results):
+  base = {(r["parser"], r["corpus"]): r for r in baseline}
+  comparison = []
+  for r in results:
+    b = base.get((r["parser"], r["corpus"]))
+    if b is not None and b["packets_per_second"] > 0:
+      comparison.append((r["parser"], r["corpus"], r["packets_per_second"]/b["packets_per_second"]))
+  return comparison
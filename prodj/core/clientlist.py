@@ -1,47 +1,208 @@
+import collections
+import copy
+import functools
+import heapq
+import itertools
 import time
 import logging
-from datetime import datetime
 
+from prodj.core.beats import BeatPhase
+from prodj.core.journal import played_track_entry
+from prodj.core.playhead import Playhead
+from prodj.core.playerstate import PlayerState, PlayState, SlotState, to_enum
 from prodj.network.packets_dump import pretty_flags
+from prodj.network.packets_fast import strip_volatile_status_bytes
+
+# beat packet distances are in ms, 0xffffffff if there is no such beat (end of track)
+def beat_distance(distance):
+  return distance/1000 if distance != 0xffffffff else None
 
 class ClientList:
   def __init__(self, prodj):
-    self.clients = []
+    self.clients = [] # in order of appearance
+    # indexes of clients, maintained by addClient, removeClient, renumberClient and setLoadedTrack
+    self.clients_by_number = {} # player_number -> Client
+    self.clients_by_ip = {} # ip_addr -> Client
+    self.clients_by_track = {} # (loaded_player_number, loaded_slot, track_id) -> list of Clients
     self.client_keepalive_callback = None
     self.client_change_callback = None
     self.media_change_callback = None
     self.log_played_tracks = True
     self.auto_request_beatgrid = True # to enable position detection
     self.auto_track_download = False
+    self.status_packets_skipped = 0 # repeated status packets which were not parsed
+    self.batch_changes = None # player numbers changed during the current batch
+    self.telemetry_size = None # number of TelemetryBuffer rows per client (requires numpy), None disables telemetry
+    self.snapshot = ClientListSnapshot(()) # immutable copy of all clients, replaced after every applied packet
+    self.frozen_clients = {} # Client -> FrozenClient of the current snapshot
+    # (loaded track, metadata) stored by the DataProvider thread, applied by the ingest thread, see applyPendingMetadata
+    self.pending_metadata = collections.deque()
+    self.change_subscriptions = [] # ChangeSubscriptions receiving changed fields, see subscribeChanges
+    self.client_timeout = 5 # drop clients after this many seconds without packets
+    # heap of (deadline, sequence, client), one entry per client, deadlines may be outdated, see gc
+    self.expiry_queue = []
+    self.expiry_sequence = itertools.count()
     self.prodj = prodj
 
   def __len__(self):
     return len(self.clients)
 
   def getClient(self, player_number):
-    return next((p for p in self.clients if p.player_number == player_number), None)
+    return self.clients_by_number.get(player_number)
+
+  def getClientByIp(self, ip_addr):
+    return self.clients_by_ip.get(ip_addr)
+
+  def addClient(self, c):
+    self.createTelemetry(c)
+    self.clients += [c]
+    self.clients_by_number[c.player_number] = c
+    self.clients_by_ip[c.ip_addr] = c
+    self.clients_by_track.setdefault(c.loadedTrack(), []).append(c)
+    self.scheduleExpiry(c)
+    self.publish(c)
+
+  # replaces the snapshot by one containing the current state of client c (or without c if it was removed)
+  # readers get a consistent view by reading self.snapshot once, without any locking
+  # only called by the ingest thread, thus clients are never frozen while a packet is applied halfway
+  def publish(self, c):
+    if self.clients_by_ip.get(c.ip_addr) is c:
+      self.frozen_clients[c] = c.freeze()
+    else:
+      self.frozen_clients.pop(c, None)
+    self.snapshot = ClientListSnapshot(tuple(self.frozen_clients[x] for x in self.clients if x in self.frozen_clients))
+
+  def createTelemetry(self, c):
+    if self.telemetry_size is None:
+      c.telemetry = None
+      return
+    from prodj.core.telemetry import TelemetryBuffer # numpy is only required if telemetry is enabled
+    c.telemetry = TelemetryBuffer(self.telemetry_size)
+
+  # timestamp is the arrival time of the packet on the time.monotonic() clock
+  def recordTelemetry(self, c, timestamp):
+    if c.telemetry is not None:
+      c.telemetry.append(timestamp, c.bpm, c.actual_pitch, c.position, c.beat_count)
+
+  def removeClient(self, c):
+    self.clients = [x for x in self.clients if x is not c]
+    if self.clients_by_number.get(c.player_number) is c:
+      del self.clients_by_number[c.player_number]
+    if self.clients_by_ip.get(c.ip_addr) is c:
+      del self.clients_by_ip[c.ip_addr]
+    self.unindexLoadedTrack(c)
+    self.publish(c)
+
+  def renumberClient(self, c, player_number):
+    if self.clients_by_number.get(c.player_number) is c:
+      del self.clients_by_number[c.player_number]
+    self.setField(c, "player_number", player_number)
+    self.clients_by_number[player_number] = c
+    self.publish(c)
+
+  def setLoadedTrack(self, c, loaded_player_number, loaded_slot, track_id):
+    if c.loadedTrack() == (loaded_player_number, loaded_slot, track_id):
+      return
+    self.unindexLoadedTrack(c)
+    self.setField(c, "loaded_player_number", loaded_player_number)
+    self.setField(c, "loaded_slot", loaded_slot)
+    self.setField(c, "track_id", track_id)
+    self.clients_by_track.setdefault(c.loadedTrack(), []).append(c)
+
+  def unindexLoadedTrack(self, c):
+    key = c.loadedTrack()
+    clients = [x for x in self.clients_by_track.get(key, []) if x is not c]
+    if len(clients) > 0:
+      self.clients_by_track[key] = clients
+    else:
+      self.clients_by_track.pop(key, None)
+
+  # returns the client which is tempo master, None if there is none
+  def getMaster(self):
+    return next((p for p in self.clients if "master" in p.state), None)
 
   def clientsByLoadedTrack(self, loaded_player_number, loaded_slot, track_id):
-    for p in self.clients:
-      if (p.loaded_player_number == loaded_player_number and
-          p.loaded_slot == loaded_slot and
-          p.track_id == track_id):
-        yield p
+    yield from list(self.clients_by_track.get((loaded_player_number, loaded_slot, track_id), []))
 
   def clientsByLoadedTrackArtwork(self, loaded_player_number, loaded_slot, artwork_id):
-    for p in self.clients:
-      if (p.loaded_player_number == loaded_player_number and
-          p.loaded_slot == loaded_slot and
-          p.metadata is not None and
-          p.metadata["artwork_id"] == artwork_id):
-        yield p
-
+    for (player_number, slot, track_id), clients in list(self.clients_by_track.items()):
+      if player_number != loaded_player_number or slot != loaded_slot:
+        continue
+      for p in clients:
+        if p.metadata is not None and p.metadata["artwork_id"] == artwork_id:
+          yield p
+
+  # called from the DataProvider thread, the metadata is applied by the ingest thread on the next packet or gc
   def storeMetadataByLoadedTrack(self, loaded_player_number, loaded_slot, track_id, metadata):
-    for p in self.clients:
-      if (p.loaded_player_number == loaded_player_number and
-          p.loaded_slot == loaded_slot and
-          p.track_id == track_id):
+    self.pending_metadata.append(((loaded_player_number, loaded_slot, track_id), metadata))
+
+  def applyPendingMetadata(self):
+    while len(self.pending_metadata) > 0:
+      track, metadata = self.pending_metadata.popleft()
+      for p in self.clients_by_track.get(track, []):
         p.metadata = metadata
+        self.publish(p)
+        self.clientChanged(p.player_number)
+
+  # sets a field of client c and records the change for the change subscriptions
+  # returns True if the value changed
+  def setField(self, c, name, value):
+    old = getattr(c, name)
+    if old == value:
+      return False
+    setattr(c, name, value)
+    if name in c.changes:
+      c.changes[name] = (c.changes[name][0], value)
+    else:
+      c.changes[name] = (old, value)
+    return True
+
+  # calls client_change_callback and the change subscriptions, or defers it to endBatch if a batch is active
+  def clientChanged(self, player_number):
+    if self.batch_changes is not None:
+      if player_number not in self.batch_changes:
+        self.batch_changes += [player_number]
+      return
+    if self.client_change_callback:
+      self.client_change_callback(player_number)
+    c = self.getClient(player_number)
+    if c is not None:
+      self.notifyChanges(c)
+
+  # returns True if the pending changes of a client should not be delayed (or the client is gone)
+  # only valid while client_change_callback is called, afterwards the changes are cleared
+  def hasUrgentChanges(self, player_number):
+    c = self.getClient(player_number)
+    return c is None or not UrgentFields.isdisjoint(c.changes)
+
+  def notifyChanges(self, c):
+    if len(c.changes) == 0:
+      return
+    changes, c.changes = c.changes, {}
+    changes = {name: change for name, change in changes.items() if change[0] != change[1]}
+    for subscription in self.change_subscriptions:
+      subscription.notify(c, changes)
+
+  # calls cb(player_number, changes) when fields of a client change, changes maps field -> (old value, new value)
+  # if fields is given, only changes of these fields are passed and cb is only called if any of them changed
+  # player_number restricts the subscription to one player, master=True to the current tempo master
+  # clients dropped due to timeout are reported with the pseudo field "expired" changing from False to True
+  def subscribeChanges(self, cb, fields=None, player_number=None, master=False):
+    subscription = ChangeSubscription(cb, fields, player_number, master)
+    self.change_subscriptions = self.change_subscriptions+[subscription]
+    return subscription
+
+  def unsubscribeChanges(self, subscription):
+    self.change_subscriptions = [s for s in self.change_subscriptions if s is not subscription]
+
+  # collect change notifications of several packets and emit them once per client in endBatch
+  def beginBatch(self):
+    self.batch_changes = []
+
+  def endBatch(self):
+    changed, self.batch_changes = self.batch_changes, None
+    for player_number in changed:
+      self.clientChanged(player_number)
 
   def mediaChanged(self, player_number, slot):
     logging.debug("Media %s in player %d changed", slot, player_number)
@@ -49,8 +210,11 @@ class ClientList:
     if self.media_change_callback is not None:
       self.media_change_callback(self, player_number, slot)
 
-  def updatePositionByBeat(self, player_number, new_beat_count, new_play_state):
+  # timestamp is the arrival time of the packet on the time.monotonic() clock
+  def updatePositionByBeat(self, player_number, new_beat_count, new_play_state, timestamp=None):
     c = self.getClient(player_number)
+    if timestamp is None:
+      timestamp = time.monotonic()
     identifier = (c.loaded_player_number, c.loaded_slot, c.track_id)
     if identifier in self.prodj.data.beatgrid_store:
       if new_beat_count > 0:
@@ -60,27 +224,44 @@ class ClientList:
           new_beat_count -= 1
         beatgrid = self.prodj.data.beatgrid_store[identifier]
         if beatgrid is not None and len(beatgrid) > new_beat_count:
-          c.position = beatgrid[new_beat_count]["time"] / 1000
+          c.playhead.measure(beatgrid[new_beat_count]["time"] / 1000, self.lastBeatTime(c, timestamp), c.playhead.beat_gain)
+          self.setField(c, "position", c.playhead.position_at(timestamp))
       else:
-        c.position = 0
+        c.playhead.measure(0, timestamp, 1)
+        self.setField(c, "position", 0)
     else:
-      c.position = None
-    c.position_timestamp = time.time()
-
-  def logPlayedTrackCallback(self, request, source_player_number, slot, item_id, reply):
+      c.playhead.reset()
+      self.setField(c, "position", None)
+    c.position_timestamp = timestamp
+
+  # time of the beat a status packet with a new beat count refers to, the packet arrives some time after the beat
+  # the beat phase knows the time of the beat from the beat packets if they are recent
+  def lastBeatTime(self, c, timestamp):
+    phase = c.beat_phase
+    if phase.valid(timestamp) and 0 <= timestamp-phase.beat_time < phase.interval/2:
+      return phase.beat_time
+    return timestamp
+
+  # the playhead moves at the actual pitch except in cued state
+  def updatePlayheadPitch(self, c, timestamp):
+    pitch = c.actual_pitch if c.play_state != "cued" and isinstance(c.actual_pitch, (int, float)) else 0
+    c.playhead.set_pitch(pitch, timestamp if timestamp is not None else time.monotonic())
+
+  # c is the frozen client at the time the track was loaded, timestamp the unix time of loading it
+  def logPlayedTrackCallback(self, c, timestamp, request, source_player_number, slot, item_id, reply):
     if request != "metadata" or reply is None or len(reply) == 0:
       return
-    with open("tracks.log", "a") as f:
-      f.write("{}: {} - {} ({})\n".format(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), reply["artist"], reply["title"], reply["album"]))
+    logging.info("Player %d loaded %s - %s", c.player_number, reply.get("artist"), reply.get("title"))
+    self.prodj.record_played_track(played_track_entry(c, reply, timestamp, self.prodj.network_name))
 
   # adds client if it is not known yet, in any case it resets the ttl
   def eatKeepalive(self, keepalive_packet):
     if keepalive_packet.type in ["type_ip", "type_status"] and keepalive_packet.content.flags.is_nxs_gw:
       logging.debug(f"Dropping NXS-GW packet from {keepalive_packet.content.ip_addr} player {pretty_flags(keepalive_packet.content.flags)}")
       return
-    c = next((x for x in self.clients if x.ip_addr == keepalive_packet.content.ip_addr), None)
+    c = self.getClientByIp(keepalive_packet.content.ip_addr)
     if c is None:
-      conflicting_client = next((x for x in self.clients if x.player_number == keepalive_packet.content.player_number), None)
+      conflicting_client = self.getClient(keepalive_packet.content.player_number)
       if conflicting_client is not None:
         logging.warning("New Player %d (%s), but already used by %s, ignoring keepalive",
           keepalive_packet.content.player_number, keepalive_packet.content.ip_addr, conflicting_client.ip_addr)
@@ -90,7 +271,7 @@ class ClientList:
       c.ip_addr = keepalive_packet.content.ip_addr
       c.mac_addr = keepalive_packet.content.mac_addr
       c.player_number = keepalive_packet.content.player_number
-      self.clients += [c]
+      self.addClient(c)
       logging.info("New Player %d: %s, %s, %s", c.player_number, c.model, c.ip_addr, c.mac_addr)
       if self.client_keepalive_callback:
         self.client_keepalive_callback(c.player_number)
@@ -100,13 +281,30 @@ class ClientList:
       if c.player_number != n:
         logging.info("Player {} changed player number from {} to {}".format(c.ip_addr, c.player_number, n))
         old_player_number = c.player_number
-        c.player_number = n
+        self.renumberClient(c, n)
+        c.status_raw = None
         for pn in [old_player_number, c.player_number]:
           if self.client_keepalive_callback:
             self.client_keepalive_callback(pn)
-          if self.client_change_callback:
-            self.client_change_callback(pn)
+          self.clientChanged(pn)
+    c.updateTtl()
+    self.publish(c)
+
+  # players resend identical status packets while paused or cued
+  # returns True if data is equal to the last status packet of the player apart from volatile fields,
+  # in this case only the ttl is refreshed and the packet does not need to be parsed and applied
+  def eatUnchangedStatus(self, data, timestamp=None):
+    if len(data) < 0x22:
+      return False
+    c = self.getClient(data[0x21])
+    if c is None or c.status_raw is None or c.status_raw != strip_volatile_status_bytes(data):
+      return False
+    if not c.supports_absolute_position_packets:
+      c.updatePositionByPitch(timestamp)
     c.updateTtl()
+    self.publish(c)
+    self.status_packets_skipped += 1
+    return True
 
   # updates pitch/bpm/beat information for player if we do not receive status packets (e.g. no vcdj enabled)
   def eatBeat(self, beat_packet):
@@ -115,44 +313,50 @@ class ClientList:
       return
     c.updateTtl()
     client_changed = False;
+    if beat_packet.type == "type_beat": # beat timing is kept regardless of status packets
+      distances = beat_packet.content.distances
+      c.beat_phase.update(beat_packet.timestamp, beat_distance(distances.next_beat), beat_distance(distances.next_bar))
     if beat_packet.type == "type_mixer":
       for x in range(1,5):
         player = self.getClient(x)
         if player is not None:
           on_air = beat_packet.content.ch_on_air[x-1] == 1
-          if player.on_air != on_air:
-            player.on_air = on_air
-            client_changed = True
+          if self.setField(player, "on_air", on_air):
+            self.publish(player)
+            self.clientChanged(player.player_number)
     elif beat_packet.type == "type_beat" and (not c.status_packet_received or c.model == "CDJ-2000"):
       new_actual_pitch = beat_packet.content.pitch
-      if c.actual_pitch != new_actual_pitch:
-        c.actual_pitch = new_actual_pitch
+      if self.setField(c, "actual_pitch", new_actual_pitch):
         client_changed = True
       new_bpm = beat_packet.content.bpm
-      if c.bpm != new_bpm:
-        c.bpm = new_bpm
+      if self.setField(c, "bpm", new_bpm):
         client_changed = True
       new_beat = beat_packet.content.beat
-      if c.beat != new_beat:
-        c.beat = new_beat
+      if self.setField(c, "beat", new_beat):
         client_changed = True
     elif beat_packet.type == "type_absolute_position":
       if not c.supports_absolute_position_packets:
         c.supports_absolute_position_packets = True
       new_actual_pitch = beat_packet.content.pitch / 100
-      if c.actual_pitch != new_actual_pitch:
-        c.actual_pitch = new_actual_pitch
+      if self.setField(c, "actual_pitch", new_actual_pitch):
         client_changed = True
       
-      new_position = beat_packet.content.playhead / 1000
-      if c.position != new_position:
-        c.position = new_position
+      new_position = c.playhead.measure(beat_packet.content.playhead / 1000, beat_packet.timestamp)
+      c.position_timestamp = beat_packet.timestamp
+      if self.setField(c, "position", new_position):
         client_changed = True
-    if self.client_change_callback and client_changed:
-      self.client_change_callback(c.player_number)
+    if beat_packet.type in ["type_beat", "type_absolute_position"]:
+      self.updatePlayheadPitch(c, beat_packet.timestamp)
+      self.recordTelemetry(c, beat_packet.timestamp)
+    if client_changed:
+      c.status_raw = None # values from beat packets differ from the last status packet
+    self.publish(c)
+    if client_changed:
+      self.clientChanged(c.player_number)
 
   # update all known player information
-  def eatStatus(self, status_packet):
+  # data is the raw packet, it is remembered to skip repeated packets in eatUnchangedStatus
+  def eatStatus(self, status_packet, data=None):
     if status_packet.type not in ["cdj", "djm", "link_reply"]:
       logging.info("Received %s status packet from player %d, ignoring", status_packet.type, status_packet.player_number)
       return
@@ -173,119 +377,108 @@ class ClientList:
       logging.info("Player %d Link Info: %s \"%s\", %d tracks, %d playlists, %d/%dMB free",
         c.player_number, status_packet.content.slot, link_info["name"], link_info["track_count"], link_info["playlist_count"],
         link_info["bytes_free"]//1024//1024, link_info["bytes_total"]//1024//1024)
+      self.publish(c)
       self.mediaChanged(c.player_number, status_packet.content.slot)
       return
     c.type = status_packet.type # cdj or djm
 
     new_bpm = status_packet.content.bpm if status_packet.content.bpm != 655.35 else "-"
-    if c.bpm != new_bpm:
-      c.bpm = new_bpm
+    if self.setField(c, "bpm", new_bpm):
       client_changed = True
 
     new_pitch = status_packet.content.physical_pitch
-    if c.pitch != new_pitch:
-      c.pitch = new_pitch
+    if self.setField(c, "pitch", new_pitch):
       client_changed = True
 
     new_beat = status_packet.content.beat if status_packet.content.beat != 0xffffffff else 0
-    if c.beat != new_beat and new_beat != 0:
-      c.beat = new_beat
+    if new_beat != 0 and self.setField(c, "beat", new_beat):
       client_changed = True
 
-    new_state = [x for x in ["on_air","sync","master","play"] if status_packet.content.state[x]==True]
-    if c.state != new_state:
-      c.state = new_state
+    new_state = PlayerState.from_flags(status_packet.content.state)
+    if self.setField(c, "state", new_state):
       client_changed = True
 
     if c.type == "cdj":
       new_beat_count = status_packet.content.beat_count if status_packet.content.beat_count != 0xffffffff else 0
-      new_play_state = status_packet.content.play_state
+      new_play_state = to_enum(PlayState, status_packet.content.play_state)
       if not c.supports_absolute_position_packets:
         if new_beat_count != c.beat_count or new_play_state != c.play_state:
-          self.updatePositionByBeat(c.player_number, new_beat_count, new_play_state) # position tracking, set new absolute grid value
+          self.updatePositionByBeat(c.player_number, new_beat_count, new_play_state, status_packet.timestamp) # position tracking, set new absolute grid value
         else: # otherwise, increment by pitch
-          c.updatePositionByPitch()
+          c.updatePositionByPitch(status_packet.timestamp)
 
       if "key" in status_packet.content:
         new_key = status_packet.content.key
-        if c.key != new_key:
-          c.key = new_key
+        if self.setField(c, "key", new_key):
           client_changed = True
       
       if "key_shift" in status_packet.content:
         new_key_shift = status_packet.content.key_shift
-        if c.key_shift != new_key_shift:
-          c.key_shift = new_key_shift
+        if self.setField(c, "key_shift", new_key_shift):
           client_changed = True
 
       if "loopStart" in status_packet.content:
         new_loop_start = status_packet.content.loopStart / 1_000_000
-        if c.loop_start != new_loop_start:
-          c.loop_start = new_loop_start
+        if self.setField(c, "loop_start", new_loop_start):
           client_changed = True
 
       if "loopEnd" in status_packet.content:
         new_loop_end = status_packet.content.loopEnd / 1_000_000
-        if c.loop_end != new_loop_end:
-          c.loop_end = new_loop_end
+        if self.setField(c, "loop_end", new_loop_end):
           client_changed = True
 
       if "wholeLoopLength" in status_packet.content:
         new_whole_loop_length = status_packet.content.wholeLoopLength
-        if c.whole_loop_length != new_whole_loop_length:
-          c.whole_loop_length = new_whole_loop_length
+        if self.setField(c, "whole_loop_length", new_whole_loop_length):
           client_changed = True
 
-      if c.beat_count != new_beat_count:
-        c.beat_count = new_beat_count
+      if self.setField(c, "beat_count", new_beat_count):
         client_changed = True
 
-      if c.play_state != new_play_state:
-        c.play_state = new_play_state
+      if self.setField(c, "play_state", new_play_state):
         client_changed = True
 
       c.fw = status_packet.content.firmware
 
       new_actual_pitch = status_packet.content.actual_pitch
-      if c.actual_pitch != new_actual_pitch:
-        c.actual_pitch = new_actual_pitch
+      if self.setField(c, "actual_pitch", new_actual_pitch):
         client_changed = True
 
       new_cue_distance = status_packet.content.cue_distance if status_packet.content.cue_distance != 511 else "-"
-      if c.cue_distance != new_cue_distance:
-        c.cue_distance = new_cue_distance
+      if self.setField(c, "cue_distance", new_cue_distance):
         client_changed = True
 
-      new_usb_state = status_packet.content.usb_state
-      if c.usb_state != new_usb_state:
-        c.usb_state = new_usb_state
+      new_usb_state = to_enum(SlotState, status_packet.content.usb_state)
+      if self.setField(c, "usb_state", new_usb_state):
+        client_changed = True
         if new_usb_state != "loaded":
           c.usb_info = {}
         else:
           self.prodj.vcdj.query_link_info(c.player_number, "usb")
         self.mediaChanged(c.player_number, "usb")
-      new_sd_state = status_packet.content.sd_state
-      if c.sd_state != new_sd_state:
-        c.sd_state = new_sd_state
+      new_sd_state = to_enum(SlotState, status_packet.content.sd_state)
+      if self.setField(c, "sd_state", new_sd_state):
+        client_changed = True
         if new_sd_state != "loaded":
           c.sd_info = {}
         else:
           self.prodj.vcdj.query_link_info(c.player_number, "sd")
         self.mediaChanged(c.player_number, "sd")
       c.track_number = status_packet.content.track_number
-      c.loaded_player_number = status_packet.content.loaded_player_number
-      c.loaded_slot = status_packet.content.loaded_slot
       c.track_analyze_type = status_packet.content.track_analyze_type
 
       new_track_id = status_packet.content.track_id
-      if c.track_id != new_track_id:
-        c.track_id = new_track_id
+      track_changed = c.track_id != new_track_id
+      self.setLoadedTrack(c, status_packet.content.loaded_player_number, status_packet.content.loaded_slot, new_track_id)
+      if track_changed:
         client_changed = True
         c.metadata = None
-        c.position = None
+        c.playhead.reset()
+        self.setField(c, "position", None)
         if c.loaded_slot in ["usb", "sd"] and c.track_analyze_type == "rekordbox":
           if self.log_played_tracks:
-            self.prodj.data.get_metadata(c.loaded_player_number, c.loaded_slot, c.track_id, self.logPlayedTrackCallback)
+            self.prodj.data.get_metadata(c.loaded_player_number, c.loaded_slot, c.track_id,
+              functools.partial(self.logPlayedTrackCallback, c.freeze(), time.time()))
           if self.auto_request_beatgrid and c.track_id != 0:
             self.prodj.data.get_beatgrid(c.loaded_player_number, c.loaded_slot, c.track_id)
           if self.auto_track_download:
@@ -293,27 +486,75 @@ class ClientList:
             self.prodj.data.get_mount_info(c.loaded_player_number, c.loaded_slot,
               c.track_id, self.prodj.nfs.enqueue_download_from_mount_info)
 
+    c.status_raw = strip_volatile_status_bytes(data) if data is not None else None
     c.updateTtl()
-    if self.client_change_callback and client_changed:
-      self.client_change_callback(c.player_number)
-
-  # checks ttl and clears expired clients
-  def gc(self):
-    cur_clients = self.clients
-    self.clients = []
-    for client in cur_clients:
-      if not client.ttlExpired():
-        self.clients += [client]
-      else:
-        logging.info("Player {} dropped due to timeout".format(client.player_number))
-        if self.client_change_callback:
-          self.client_change_callback(client.player_number)
+    if c.type == "cdj":
+      self.updatePlayheadPitch(c, status_packet.timestamp)
+    self.recordTelemetry(c, status_packet.timestamp)
+    self.publish(c)
+    if client_changed:
+      self.clientChanged(c.player_number)
+
+  def scheduleExpiry(self, c):
+    heapq.heappush(self.expiry_queue, (c.ttl+self.client_timeout, next(self.expiry_sequence), c))
+
+  # applies pending metadata and clears expired clients, only does work when the earliest deadline has passed
+  # updateTtl does not touch the queue, deadlines of clients which sent packets meanwhile are rescheduled here
+  def gc(self, now=None):
+    self.applyPendingMetadata()
+    if now is None:
+      now = time.time()
+    while len(self.expiry_queue) > 0 and self.expiry_queue[0][0] <= now:
+      _, _, client = heapq.heappop(self.expiry_queue)
+      if self.clients_by_ip.get(client.ip_addr) is not client: # already removed
+        continue
+      if not client.ttlExpired(now, self.client_timeout):
+        self.scheduleExpiry(client)
+        continue
+      self.removeClient(client)
+      logging.info("Player {} dropped due to timeout".format(client.player_number))
+      self.clientChanged(client.player_number)
+      client.changes["expired"] = (False, True)
+      self.notifyChanges(client)
 
   # returns a list of ips of all clients (used to guess own ip)
   def getClientIps(self):
     return [client.ip_addr for client in self.clients]
 
+# changes which are delivered immediately by rate limited callbacks, see ProDj.throttle
+UrgentFields = {"player_number", "loaded_player_number", "loaded_slot", "track_id",
+  "usb_state", "sd_state", "expired"}
+
+# urgent argument of CallbackDispatcher for change subscription callbacks (player_number, changes)
+def urgent_changes(args):
+  return not UrgentFields.isdisjoint(args[1])
+
+class ChangeSubscription:
+  def __init__(self, callback, fields, player_number, master):
+    self.callback = callback
+    self.fields = set(fields) if fields is not None else None
+    self.player_number = player_number
+    self.master = master
+
+  def notify(self, c, changes):
+    if self.player_number is not None and c.player_number != self.player_number:
+      return
+    if self.master and "master" not in c.state:
+      return
+    if self.fields is not None:
+      changes = {name: change for name, change in changes.items() if name in self.fields}
+    if len(changes) > 0:
+      self.callback(c.player_number, changes)
+
+# fixed set of attributes, thus clients are compact and cheap to copy
 class Client:
+  __slots__ = ["type", "model", "fw", "ip_addr", "mac_addr", "player_number",
+    "bpm", "key", "key_shift", "loop_start", "loop_end", "whole_loop_length", "pitch", "actual_pitch",
+    "beat", "beat_count", "cue_distance", "play_state", "usb_state", "usb_info", "sd_state", "sd_info",
+    "loaded_player_number", "loaded_slot", "track_analyze_type", "state", "track_number", "track_id",
+    "position", "position_timestamp", "on_air", "beat_phase", "playhead",
+    "metadata", "status_packet_received", "supports_absolute_position_packets", "status_raw", "changes", "telemetry", "ttl"]
+
   def __init__(self):
     # device specific
     self.type = "" # cdj, djm, rekordbox (currently rekordbox is detected as djm)
@@ -334,42 +575,98 @@ class Client:
     self.beat = 0
     self.beat_count = None
     self.cue_distance = None
-    self.play_state = "no_track"
-    self.usb_state = "not_loaded"
+    self.play_state = PlayState.no_track
+    self.usb_state = SlotState.not_loaded
     self.usb_info = {}
-    self.sd_state = "not_loaded"
+    self.sd_state = SlotState.not_loaded
     self.sd_info = {}
     self.loaded_player_number = 0
     self.loaded_slot = "empty"
     self.track_analyze_type = "unknown"
-    self.state = []
+    self.state = PlayerState(0)
     self.track_number = None
     self.track_id = 0
     self.position = None # position in track in seconds, 0 if not determinable
-    self.position_timestamp = None
+    self.position_timestamp = None # time.monotonic() of the packet position was derived from
     self.on_air = False
+    self.beat_phase = BeatPhase() # timing of the beats, from beat packets
+    self.playhead = Playhead() # filtered position estimate, position is its value at position_timestamp
     # internal use
     self.metadata = None
     self.status_packet_received = False # ignore play state from beat packets
     self.supports_absolute_position_packets = False
+    self.status_raw = None # last status packet without volatile fields
+    self.telemetry = None # TelemetryBuffer, see ClientList.telemetry_size
+    self.changes = {} # field -> (old value, new value) since the last change notification, see ClientList.setField
     self.ttl = time.time()
 
-  # calculate the current position by linear interpolation
-  def updatePositionByPitch(self):
+  # calculate the current position from the playhead estimate
+  # timestamp is the arrival time of the packet on the time.monotonic() clock, defaults to now
+  def updatePositionByPitch(self, timestamp=None):
     if not self.position or self.actual_pitch == 0:
       return
-    pitch = self.actual_pitch
-    if self.play_state in ["cued"]:
-      pitch = 0
-    now = time.time()
-    self.position += pitch*(now-self.position_timestamp)
+    now = timestamp if timestamp is not None else time.monotonic()
+    position = self.playhead.position_at(now)
+    if position is None:
+      return
+    self.position = position
     self.position_timestamp = now
     #logging.debug("Track position inc %f actual_pitch %.6f play_state %s beat %d", self.position, self.actual_pitch, self.play_state, self.beat_count)
     return self.position
 
+  # shallow copy, all fields except changes, beat_phase and playhead are replaced instead of modified
+  def copy(self, cls=None):
+    if cls is None:
+      cls = Client
+    c = cls.__new__(cls)
+    for name in Client.__slots__:
+      object.__setattr__(c, name, getattr(self, name))
+    object.__setattr__(c, "beat_phase", copy.copy(self.beat_phase))
+    object.__setattr__(c, "playhead", copy.copy(self.playhead))
+    object.__setattr__(c, "changes", {})
+    return c
+
+  def freeze(self):
+    return self.copy(FrozenClient)
+
+  def loadedTrack(self):
+    return self.loaded_player_number, self.loaded_slot, self.track_id
+
   def updateTtl(self):
     self.ttl = time.time()
 
-  # drop clients after 5 seconds without keepalive packet
-  def ttlExpired(self):
-    return time.time()-self.ttl > 5
+  # drop clients after timeout seconds without keepalive packet
+  def ttlExpired(self, now=None, timeout=5):
+    if now is None:
+      now = time.time()
+    return now-self.ttl >= timeout
+
+# immutable copy of a client, see ClientList.snapshot
+class FrozenClient(Client):
+  __slots__ = []
+
+  def __setattr__(self, name, value):
+    raise AttributeError("FrozenClient is immutable")
+
+# immutable state of all clients at one point in time, see ClientList.publish
+class ClientListSnapshot:
+  __slots__ = ["clients", "clients_by_number"]
+
+  def __init__(self, clients):
+    object.__setattr__(self, "clients", clients)
+    object.__setattr__(self, "clients_by_number", {c.player_number: c for c in clients})
+
+  def __setattr__(self, name, value):
+    raise AttributeError("ClientListSnapshot is immutable")
+
+  def __len__(self):
+    return len(self.clients)
+
+  def __iter__(self):
+    return iter(self.clients)
+
+  def getClient(self, player_number):
+    return self.clients_by_number.get(player_number)
+
+  def getMaster(self):
+    return next((p for p in self.clients if "master" in p.state), None)
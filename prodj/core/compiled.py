@@ -0,0 +1,50 @@
+# compiled construct mode
+# construct can compile structs into python source, which parses several times faster than
+# interpreting the struct definitions. set_compiled_mode(True) compiles every struct of the
+# wire and file formats once and switches its instances to the compiled parser, so any user
+# (including imported names and structs nested in other structs) is affected. structs which
+# can not be compiled stay interpreted, building always uses the interpreted definitions.
+
+import logging
+
+from construct import Construct
+import construct
+
+from prodj.network import packets, packets_nfs
+from prodj.pdblib import album, artist, artwork, color, genre, key, label, page, pdbfile, piostring, playlist, playlist_map, track, usbanlz
+
+# structs are named after the first module containing them, thus dependencies go first
+CompiledModules = [packets, packets_nfs, piostring, album, artist, artwork, color, genre, key, label, playlist, playlist_map, track, page, pdbfile, usbanlz]
+
+# primitives like Int8ub are constructs from the construct module itself and not worth compiling
+ConstructPrimitives = set(id(x) for x in vars(construct).values() if isinstance(x, Construct))
+
+# (module name, struct name) -> (struct, compiled struct)
+compiled_structs = {}
+compiled_mode = False
+
+def compile_structs():
+  if compiled_structs:
+    return
+  for module in CompiledModules:
+    for name, struct in vars(module).items():
+      if not isinstance(struct, Construct) or id(struct) in ConstructPrimitives:
+        continue
+      if any(s is struct for s, c in compiled_structs.values()): # imported from another module
+        continue
+      try:
+        compiled_structs[(module.__name__, name)] = (struct, struct.compile())
+      except Exception as e:
+        logging.debug("Unable to compile %s.%s: %s", module.__name__, name, str(e).split("\n")[0])
+  logging.debug("Compiled %d structs", len(compiled_structs))
+
+def set_compiled_mode(enabled):
+  global compiled_mode
+  if enabled:
+    compile_structs()
+  for struct, compiled in compiled_structs.values():
+    if enabled:
+      struct._parse = compiled._parse
+    else:
+      struct.__dict__.pop("_parse", None)
+  compiled_mode = enabled
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from threading import Condition, Thread
+import logging
+import time
+import traceback
+
+from prodj.core.pipeline import LatencyStats
+
+# merges the changes of two calls of a change subscription callback (player_number, changes)
+# keeps the oldest old value and the newest new value of every field
+def merge_changes(old_args, new_args):
+  changes = dict(old_args[1])
+  for name, (old, new) in new_args[1].items():
+    changes[name] = (changes[name][0], new) if name in changes else (old, new)
+  return new_args[0], changes
+
+# calls a callback in its own thread, see ProDj.dispatch
+# instances are callable and can be passed wherever a callback is expected, the caller only enqueues the arguments
+# at most size calls are queued, on overflow the policy decides what is discarded:
+#   "drop_oldest": the oldest queued call is dropped
+#   "coalesce": calls with the same first argument (usually the player number) are combined into one call,
+#     using merge(old_args, new_args) if given, otherwise only the newest arguments are kept.
+#     if all queued calls have different keys, the oldest one is dropped
+# with policy "coalesce", max_rate limits the calls per second for each key, calls arriving meanwhile are combined
+# calls for which urgent(args) returns True are delivered immediately regardless of max_rate
+# clock returns the current time in seconds, time.monotonic() unless replaced (e.g. by tests)
+class CallbackDispatcher(Thread):
+  def __init__(self, callback, name=None, size=64, policy="drop_oldest", merge=None, max_rate=None, urgent=None):
+    super().__init__(name=name, daemon=True)
+    if policy not in ["drop_oldest", "coalesce"]:
+      raise ValueError("Unknown overflow policy {}".format(policy))
+    if max_rate is not None and policy != "coalesce":
+      raise ValueError("max_rate requires policy coalesce")
+    self.callback = callback
+    self.size = size
+    self.policy = policy
+    self.merge = merge
+    self.interval = 1/max_rate if max_rate is not None else 0
+    self.urgent = urgent
+    self.clock = time.monotonic
+    self.last_calls = {} # key -> clock() of the last call, for max_rate
+    self.queue = OrderedDict() # sequence or coalescing key -> (args, enqueue time, urgent)
+    self.condition = Condition()
+    self.keep_running = True
+    self.sequence = 0
+    self.calls = 0
+    self.dropped = 0
+    self.coalesced = 0
+    self.lag = LatencyStats() # from enqueued until the callback is called
+    self.duration = LatencyStats() # time spent in the callback
+
+  def __call__(self, *args):
+    urgent = self.urgent is not None and self.urgent(args)
+    with self.condition:
+      if not self.keep_running:
+        return
+      key = self.sequence
+      self.sequence += 1
+      if self.policy == "coalesce" and len(args) > 0:
+        key = ("coalesce", args[0])
+        if key in self.queue:
+          old_args, enqueued, old_urgent = self.queue[key]
+          self.queue[key] = (self.merge(old_args, args) if self.merge is not None else args, enqueued, old_urgent or urgent)
+          self.coalesced += 1
+          if urgent:
+            self.condition.notify()
+          return
+      if len(self.queue) >= self.size:
+        self.queue.popitem(last=False)
+        self.dropped += 1
+      self.queue[key] = (args, self.clock(), urgent)
+      self.condition.notify()
+
+  # returns the key of the first queued call which may be delivered now and the time to wait otherwise
+  def next_due(self, now):
+    if self.interval == 0:
+      return next(iter(self.queue)), None
+    wait = None
+    for key, (_, _, urgent) in self.queue.items():
+      if urgent or key not in self.last_calls:
+        return key, None
+      due = self.last_calls[key]+self.interval
+      if due <= now:
+        return key, None
+      wait = due-now if wait is None else min(wait, due-now)
+    return None, wait
+
+  # removes the next call which may be delivered at now and returns (args, enqueue time), None
+  # otherwise and the time to wait for the next call (None if nothing is queued)
+  def take(self, now):
+    with self.condition:
+      if len(self.queue) == 0:
+        return None, None
+      key, wait = self.next_due(now)
+      if key is None:
+        return None, wait
+      args, enqueued, _ = self.queue.pop(key)
+      if self.interval > 0:
+        self.last_calls[key] = now
+      return (args, enqueued), None
+
+  # number of queued calls and age of the oldest one in seconds
+  def pending(self):
+    with self.condition:
+      if len(self.queue) == 0:
+        return 0, 0
+      _, enqueued, _ = next(iter(self.queue.values()))
+      return len(self.queue), self.clock()-enqueued
+
+  def stats(self):
+    count, age = self.pending()
+    return {"calls": self.calls, "dropped": self.dropped, "coalesced": self.coalesced,
+      "pending": count, "pending_age": age, "lag": self.lag.as_dict(), "duration": self.duration.as_dict()}
+
+  def stop(self):
+    with self.condition:
+      self.keep_running = False
+      self.condition.notify()
+
+  def run(self):
+    logging.debug("dispatcher %s started", self.name)
+    while True:
+      with self.condition:
+        while self.keep_running:
+          call, wait = self.take(self.clock())
+          if call is not None:
+            break
+          self.condition.wait(wait)
+        if not self.keep_running:
+          break
+      args, enqueued = call
+      start = self.clock()
+      self.lag.add(start-enqueued)
+      try:
+        self.callback(*args)
+      except Exception as e:
+        logging.critical("Exception in dispatcher "+self.name+": "+str(e)+"\n"+traceback.format_exc())
+      self.duration.add(self.clock()-start)
+      self.calls += 1
+    logging.debug("dispatcher %s stopped", self.name)
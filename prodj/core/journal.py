@@ -0,0 +1,124 @@
+import logging
+import sqlite3
+import time
+import traceback
+from threading import Condition, Thread
+
+JournalFields = ["time", "network", "player_number", "loaded_player_number", "loaded_slot", "track_id", "on_air",
+  "artist_id", "album_id", "artwork_id", "title", "artist", "album", "duration"]
+
+# creates a journal entry for a track loaded by client c, metadata is the reply of DataProvider.get_metadata
+def played_track_entry(c, metadata, timestamp=None, network=""):
+  entry = {
+    "time": timestamp if timestamp is not None else time.time(),
+    "network": network,
+    "player_number": c.player_number,
+    "loaded_player_number": c.loaded_player_number,
+    "loaded_slot": c.loaded_slot,
+    "track_id": c.track_id,
+    "on_air": c.on_air}
+  for field in JournalFields[7:]:
+    entry[field] = metadata.get(field)
+  return entry
+
+# sqlite database of played tracks, see ProDj.record_played_track
+# entries are buffered in memory and inserted by this thread in one transaction per batch,
+# thus recording never waits for the disk. queries include entries which are not written yet.
+class PlayedTracksJournal(Thread):
+  def __init__(self, filename="tracks.db"):
+    super().__init__(daemon=True)
+    self.filename = filename
+    self.flush_interval = 1 # seconds to collect entries before writing them
+    self.buffer = []
+    self.writing = [] # entries of the batch being written, for query
+    self.condition = Condition()
+    self.keep_running = True
+    self.written = 0
+    self.create_table()
+
+  def connect(self):
+    return sqlite3.connect(self.filename, timeout=10)
+
+  def create_table(self):
+    with self.connect() as db:
+      db.execute("create table if not exists played_tracks (id integer primary key, {})".format(", ".join(JournalFields)))
+      db.execute("create index if not exists played_tracks_time on played_tracks (time)")
+      db.execute("create index if not exists played_tracks_track on played_tracks (loaded_player_number, loaded_slot, track_id)")
+    db.close()
+
+  # entry is a dict with the keys of JournalFields, see played_track_entry
+  def record(self, entry):
+    with self.condition:
+      self.buffer += [entry]
+      self.condition.notify()
+
+  def stop(self):
+    with self.condition:
+      self.keep_running = False
+      self.condition.notify()
+
+  def run(self):
+    logging.debug("played tracks journal started")
+    db = self.connect()
+    try:
+      while True:
+        with self.condition:
+          while self.keep_running and len(self.buffer) == 0:
+            self.condition.wait()
+          if self.keep_running:
+            self.condition.wait(self.flush_interval) # collect more entries
+          entries, self.buffer = self.buffer, []
+          self.writing = entries
+          keep_running = self.keep_running
+        self.write(db, entries)
+        with self.condition:
+          self.writing = []
+          if not keep_running and len(self.buffer) == 0:
+            break
+    except Exception as e:
+      logging.critical("Exception in journal.run: "+str(e)+"\n"+traceback.format_exc())
+    db.close()
+    logging.debug("played tracks journal stopped")
+
+  def write(self, db, entries):
+    if len(entries) == 0:
+      return
+    with db:
+      db.executemany("insert into played_tracks ({}) values ({})".format(", ".join(JournalFields), ", ".join("?"*len(JournalFields))),
+        [[entry[field] for field in JournalFields] for entry in entries])
+    self.written += len(entries)
+
+  # returns the entries (dicts) of tracks played between since and until (unix timestamps, None for unlimited)
+  # in chronological order, optionally only those of one player
+  def query(self, since=None, until=None, player_number=None):
+    conditions, args = [], []
+    if since is not None:
+      conditions += ["time >= ?"]
+      args += [since]
+    if until is not None:
+      conditions += ["time < ?"]
+      args += [until]
+    if player_number is not None:
+      conditions += ["player_number = ?"]
+      args += [player_number]
+    with self.condition:
+      pending = self.writing+self.buffer
+    db = self.connect()
+    try:
+      rows = db.execute("select {} from played_tracks {} order by time".format(", ".join(JournalFields),
+        "where "+" and ".join(conditions) if len(conditions) > 0 else ""), args).fetchall()
+    finally:
+      db.close()
+    entries = [dict(zip(JournalFields, row)) for row in rows]
+    # entries being written right now may already be in the database
+    written = {tuple(entry[field] for field in JournalFields) for entry in entries}
+    for entry in pending:
+      if (since is None or entry["time"] >= since) and (until is None or entry["time"] < until) and \
+          (player_number is None or entry["player_number"] == player_number) and \
+          tuple(entry[field] for field in JournalFields) not in written:
+        entries += [entry]
+    return sorted(entries, key=lambda entry: entry["time"])
+
+  # tracks played within the last seconds
+  def recent(self, seconds=3600):
+    return self.query(since=time.time()-seconds)
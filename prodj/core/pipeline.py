@@ -0,0 +1,116 @@
+from threading import Thread
+import logging
+import queue
+import time
+import traceback
+
+# number, mean and maximum of latencies in seconds
+class LatencyStats:
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self.count = 0
+    self.total = 0
+    self.max = 0
+
+  def add(self, latency):
+    self.count += 1
+    self.total += latency
+    if latency > self.max:
+      self.max = latency
+
+  def mean(self):
+    return self.total/self.count if self.count > 0 else 0
+
+  def as_dict(self):
+    return {"count": self.count, "mean": self.mean(), "max": self.max}
+
+# second stage of the packet ingest, see ProDj.pipelined
+# the receiving thread only enqueues raw datagrams in a bounded queue, this thread parses them
+# and applies them to the client list, thus slow client callbacks do not stall receiving
+# if the queue is full, new datagrams are dropped and counted
+class PacketPipeline(Thread):
+  def __init__(self, prodj, size=1024):
+    super().__init__()
+    self.prodj = prodj
+    self.queue = queue.Queue(size)
+    self.keep_running = True
+    self.max_batch_size = 64 # maximum number of packets applied as one client list batch
+    self.enqueued = 0
+    self.dropped = 0
+    self.overflowing = False
+    self.receive_latency = LatencyStats() # from kernel receive timestamp until enqueued
+    self.queue_latency = LatencyStats() # from enqueued until dequeued
+    self.process_latency = LatencyStats() # parsing and applying a packet
+    self.notify_latency = LatencyStats() # client change callbacks at the end of a batch
+
+  # receiver stage, called by the receiving thread for every datagram
+  def enqueue(self, port, data, addr, timestamp):
+    now = time.monotonic()
+    try:
+      self.queue.put_nowait((port, data, addr, timestamp, now))
+    except queue.Full:
+      self.dropped += 1
+      if not self.overflowing:
+        logging.warning("Packet queue full, dropping packets")
+        self.overflowing = True
+      return
+    self.overflowing = False
+    self.enqueued += 1
+    self.receive_latency.add(now-timestamp)
+
+  def stop(self):
+    self.keep_running = False
+
+  # state stage, applies queued packets and runs the client list garbage collection
+  def run(self):
+    logging.debug("packet pipeline started")
+    cl = self.prodj.cl
+    next_gc = time.monotonic()+self.prodj.gc_interval
+    while self.keep_running:
+      try:
+        item = self.queue.get(timeout=self.prodj.gc_interval)
+      except queue.Empty:
+        item = None
+      if item is not None:
+        cl.beginBatch()
+        try:
+          batch_size = 0
+          while item is not None:
+            self.process(*item)
+            batch_size += 1
+            item = None
+            if batch_size < self.max_batch_size:
+              try:
+                item = self.queue.get_nowait()
+              except queue.Empty:
+                pass
+        finally:
+          start = time.monotonic()
+          cl.endBatch()
+          self.notify_latency.add(time.monotonic()-start)
+      if time.monotonic() >= next_gc:
+        cl.gc()
+        next_gc = time.monotonic()+self.prodj.gc_interval
+    logging.debug("packet pipeline stopped")
+
+  def process(self, port, data, addr, timestamp, enqueued):
+    start = time.monotonic()
+    self.queue_latency.add(start-enqueued)
+    try:
+      self.prodj.dispatch_packet(port, data, addr, timestamp)
+    except Exception as e:
+      logging.critical("Exception in pipeline.process: "+str(e)+"\n"+traceback.format_exc())
+    self.process_latency.add(time.monotonic()-start)
+
+  def stats(self):
+    return {
+      "enqueued": self.enqueued,
+      "dropped": self.dropped,
+      "queued": self.queue.qsize(),
+      "receive_latency": self.receive_latency.as_dict(),
+      "queue_latency": self.queue_latency.as_dict(),
+      "process_latency": self.process_latency.as_dict(),
+      "notify_latency": self.notify_latency.as_dict()
+    }
@@ -0,0 +1,43 @@
+from enum import Enum, IntFlag
+
+from prodj.network import packets
+
+# state bits of status packets, values match packets.StateMask
+class PlayerState(IntFlag):
+  on_air = 8
+  sync = 16
+  master = 32
+  play = 64
+
+  # allows checks like "master" in client.state
+  def __contains__(self, other):
+    if isinstance(other, str):
+      other = PlayerState.__members__.get(other)
+      if other is None:
+        return False
+    return other & self == other
+
+  def names(self):
+    return [name for name, flag in PlayerState.__members__.items() if flag & self]
+
+  def __str__(self):
+    return ",".join(self.names())
+
+  @classmethod
+  def from_flags(cls, flags):
+    value = cls(0)
+    for name, flag in cls.__members__.items():
+      if flags[name]:
+        value |= flag
+    return value
+
+# the str mixin keeps comparisons with the plain strings of the packet parsers working
+PlayState = Enum("PlayState", [(name, name) for name in packets.PlayState.encmapping], type=str)
+PlayState.__str__ = str.__str__
+
+SlotState = Enum("SlotState", [(name, name) for name in packets.StorageIndicator.encmapping], type=str)
+SlotState.__str__ = str.__str__
+
+# returns the member of enum with the given value, unknown values are returned unchanged
+def to_enum(enum, value):
+  return enum._value2member_map_.get(value, value)
@@ -0,0 +1,58 @@
+# playhead of a player on the time.monotonic() clock, see Client.playhead
+# fuses absolute position packets and beatgrid positions at beat count changes with the actual pitch
+# using an alpha-beta filter: the position follows a part of each measurement error (gain) and the
+# error is integrated into a small relative rate correction (drift), which compensates the clock
+# difference between the player and this host, thus the estimate does not drift between measurements
+class Playhead:
+  def __init__(self):
+    self.position_gain = 0.5 # absolute position packets, only suffer from network jitter
+    self.beat_gain = 0.25 # beatgrid positions, status packets arrive some time after the beat
+    self.drift_gain = 0.01
+    self.max_drift = 0.002 # maximum relative rate correction
+    self.max_error = 0.2 # seconds, larger errors are jumps (e.g. cue, seeking) and applied directly
+    self.pitch = 0 # track seconds per second, 0 if stopped
+    self.reset()
+
+  def reset(self):
+    self.position = None # estimated position in seconds at timestamp
+    self.timestamp = None
+    self.drift = 0
+
+  def rate(self):
+    return self.pitch*(1+self.drift)
+
+  # estimated position in seconds at time t on the time.monotonic() clock, None if unknown
+  def position_at(self, t):
+    if self.position is None:
+      return None
+    return self.position+self.rate()*(t-self.timestamp)
+
+  # pitch is the actual pitch of the player, 0 if not moving
+  def set_pitch(self, pitch, timestamp):
+    if pitch == self.pitch:
+      return
+    if self.position is not None:
+      self.position = self.position_at(timestamp)
+      self.timestamp = timestamp
+    self.pitch = pitch
+
+  # applies a measured position at timestamp, returns the new estimate
+  def measure(self, position, timestamp, gain=None):
+    if gain is None:
+      gain = self.position_gain
+    predicted = self.position_at(timestamp)
+    if predicted is None or abs(position-predicted) > self.max_error:
+      self.position = position
+      self.timestamp = timestamp
+      self.drift = 0
+      return position
+    error = position-predicted
+    elapsed = timestamp-self.timestamp
+    if self.pitch == 0: # nothing moves, thus no drift to learn and nothing to smooth
+      gain = 1
+    elif elapsed > 0:
+      drift = self.drift+self.drift_gain*error/(elapsed*self.pitch)
+      self.drift = min(max(drift, -self.max_drift), self.max_drift)
+    self.position = predicted+gain*error
+    self.timestamp = timestamp
+    return self.position
@@ -1,29 +1,56 @@
+import asyncio
 import socket
 import logging
+import time
 from threading import Thread
 from select import select
 from enum import Enum
 
-from prodj.core.clientlist import ClientList
+from prodj.core.beats import BeatTicker, predict_beat_time
+from prodj.core.clientlist import ClientList, urgent_changes
+from prodj.core.dispatch import CallbackDispatcher, merge_changes
+from prodj.core.journal import PlayedTracksJournal
+from prodj.core.pipeline import PacketPipeline
 from prodj.core.vcdj import Vcdj
 from prodj.data.dataprovider import DataProvider
+from prodj.data.datastore import DataStore
 from prodj.network.nfsclient import NfsClient
-from prodj.network.ip import guess_own_iface
-from prodj.network import packets
+from prodj.network.ip import broadcast_address, get_iface_data, guess_own_iface
 from prodj.network import packets_dump
+from prodj.network import packets_fast
+from prodj.network.timestamps import enable_receive_timestamps, recvfrom_timestamp
+from prodj.network.tracing import PacketTrace
 
 class OwnIpStatus(Enum):
   notNeeded = 1,
   waiting = 2,
   acquired = 3
 
+# forwards datagrams received by an asyncio endpoint to ProDj.handle_packet
+class DatagramHandler(asyncio.DatagramProtocol):
+  def __init__(self, prodj, port):
+    self.prodj = prodj
+    self.port = port
+
+  # asyncio does not provide ancillary data, thus packets are timestamped in user space
+  def datagram_received(self, data, addr):
+    self.prodj.handle_packet(self.port, data, addr, time.monotonic())
+
+  def error_received(self, exc):
+    logging.warning("Receive error: %s", exc)
+
+# iface restricts the instance to one network interface, see set_interface
+# instances for several networks in one process can share the event loop and caches, see SharedResources
 class ProDj(Thread):
-  def __init__(self):
+  def __init__(self, iface=None, shared=None):
     super().__init__()
+    self.shared = shared
+    self.network_name = iface if iface is not None else "" # namespace in shared caches and prefix of downloaded databases
+    self.iface = None
     self.cl = ClientList(self)
     self.data = DataProvider(self)
     self.vcdj = Vcdj(self)
-    self.nfs = NfsClient(self)
+    self.nfs = NfsClient(self, shared.loop if shared is not None else None)
     self.keepalive_ip = "0.0.0.0"
     self.keepalive_port = 50000
     self.beat_ip = "0.0.0.0"
@@ -32,31 +59,122 @@ class ProDj(Thread):
     self.status_port = 50002
     self.need_own_ip = OwnIpStatus.notNeeded
     self.own_ip = None
+    # receive packets through asyncio endpoints on the event loop shared with the NfsClient
+    # instead of the select loop, this thread then runs the event loop
+    self.asyncio_ingest = False
+    self.gc_interval = 1
+    self.recv_buffer_size = None # SO_RCVBUF of the receiving sockets in bytes, None keeps the os default
+    self.max_batch_size = 64 # maximum number of datagrams read from one socket per wakeup
+    self.auto_detect_iface = True # guess own interface from the ips of the first clients
+    self.recorder = None # PacketRecorder receiving a copy of every datagram
+    self.trace = None # PacketTrace of the latest datagrams, see enable_tracing
+    # parse and apply packets in a separate thread, the receiving thread only queues them
+    self.pipelined = False
+    self.pipeline_size = 1024 # maximum number of queued packets
+    self.pipeline = None
+    self.transports = []
+    self.beat_ticker = None # BeatTicker, started by the first beat subscription
+    self.dispatchers = [] # CallbackDispatchers created by dispatch
+    self.journal_filename = "tracks.db" # sqlite database of played tracks, see ClientList.log_played_tracks
+    self.journal = None # PlayedTracksJournal, started by the first played track
+    if iface is not None:
+      self.set_interface(iface)
+
+  # bind all sockets to iface and take the own ip from it instead of guessing
+  def set_interface(self, iface):
+    own_ip = get_iface_data(iface)
+    if own_ip is None:
+      raise ValueError("Interface {} not found or without IPv4 address".format(iface))
+    self.iface = iface
+    self.own_ip = own_ip
+    self.auto_detect_iface = False
+    logging.info("Using interface {} ip {} mask {} mac {}".format(*self.own_ip))
+
+  # returns a cache for data of the given kind, a namespaced view if the caches are shared
+  def create_store(self, kind):
+    if self.shared is None:
+      return DataStore()
+    return self.shared.store(kind, self.network_name)
 
   def start(self):
-    self.keepalive_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    self.keepalive_sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    self.keepalive_sock.bind((self.keepalive_ip, self.keepalive_port))
+    self.keepalive_sock = self.open_socket(self.keepalive_ip, self.keepalive_port, broadcast=True)
     logging.info("Listening on {}:{} for keepalive packets".format(self.keepalive_ip, self.keepalive_port))
-    self.beat_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    self.beat_sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    self.beat_sock.bind((self.beat_ip, self.beat_port))
+    self.beat_sock = self.open_socket(self.beat_ip, self.beat_port, broadcast=True)
     logging.info("Listening on {}:{} for beat packets".format(self.beat_ip, self.beat_port))
-    self.status_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    self.status_sock.bind((self.status_ip, self.status_port))
+    self.status_sock = self.open_socket(self.status_ip, self.status_port)
     logging.info("Listening on {}:{} for status packets".format(self.status_ip, self.status_port))
     self.socks = [self.keepalive_sock, self.beat_sock, self.status_sock]
+    self.receivers = {
+      self.keepalive_sock: (self.keepalive_port, 128),
+      self.beat_sock: (self.beat_port, 128),
+      self.status_sock: (self.status_port, 1158) # max size of status packet (CDJ-3000), can also be smaller
+    }
     self.keep_running = True
     self.data.start()
-    self.nfs.start()
-    super().start()
+    if self.shared is not None:
+      self.shared.acquire()
+    self.nfs.start(run_loop=self.shared is None and not self.asyncio_ingest)
+    if self.pipelined:
+      self.pipeline = PacketPipeline(self, self.pipeline_size)
+      self.pipeline.start()
+    if self.asyncio_ingest and self.shared is not None: # no thread needed, the shared loop receives
+      asyncio.run_coroutine_threadsafe(self.open_endpoints(), self.nfs.loop).result()
+    else:
+      super().start()
+
+  def open_socket(self, ip, port, broadcast=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if broadcast:
+      sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    if self.recv_buffer_size is not None:
+      sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+    if not enable_receive_timestamps(sock):
+      logging.debug("Kernel receive timestamps not available on port %d", port)
+    sock.setblocking(False)
+    if self.iface is not None:
+      ip = self.bind_to_iface(sock, ip, broadcast)
+    sock.bind((ip, port))
+    return sock
+
+  # restricts sock to self.iface and returns the address to bind to
+  # SO_BINDTODEVICE needs linux and CAP_NET_RAW, otherwise binding to the broadcast address
+  # (receives broadcasts only) or own address (receives unicasts only) of the interface is used
+  def bind_to_iface(self, sock, ip, broadcast):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+      sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, self.iface.encode())
+      return ip
+    except (AttributeError, OSError) as e:
+      logging.debug("Unable to bind to device %s (%s), binding to address instead", self.iface, e)
+    if broadcast:
+      return broadcast_address(*self.own_ip[1:3])
+    return self.own_ip[1]
 
   def stop(self):
     self.keep_running = False
     self.nfs.stop()
+    if self.asyncio_ingest and self.shared is not None:
+      asyncio.run_coroutine_threadsafe(self.close_endpoints(), self.nfs.loop).result()
+    elif self.asyncio_ingest:
+      self.nfs.loop.call_soon_threadsafe(self.nfs.loop.stop)
     self.data.stop()
     self.vcdj_disable()
-    self.join()
+    if self.ident is not None:
+      self.join()
+    if self.shared is not None:
+      self.shared.release()
+    if self.pipeline is not None:
+      self.pipeline.stop()
+      self.pipeline.join()
+    if self.beat_ticker is not None:
+      self.beat_ticker.stop()
+      self.beat_ticker.join()
+    for dispatcher in self.dispatchers:
+      dispatcher.stop()
+      dispatcher.join()
+    if self.journal is not None:
+      self.journal.stop()
+      self.journal.join()
     self.keepalive_sock.close()
     self.beat_sock.close()
 
@@ -78,62 +196,221 @@ class ProDj(Thread):
       self.vcdj.set_interface_data(*self.own_ip[1:4])
 
   def run(self):
+    if self.asyncio_ingest:
+      self.run_asyncio()
+      return
     logging.debug("starting main loop")
     while self.keep_running:
       rdy = select(self.socks,[],[],1)[0]
       for sock in rdy:
-        if sock == self.keepalive_sock:
-          data, addr = self.keepalive_sock.recvfrom(128)
-          self.handle_keepalive_packet(data, addr)
-        elif sock == self.beat_sock:
-          data, addr = self.beat_sock.recvfrom(128)
-          self.handle_beat_packet(data, addr)
-        elif sock == self.status_sock:
-          data, addr = self.status_sock.recvfrom(1158) # max size of status packet (CDJ-3000), can also be smaller
-          self.handle_status_packet(data, addr)
-      self.cl.gc()
+        port, size = self.receivers[sock]
+        if self.pipeline is not None: # batching is done by the pipeline
+          for data, addr, timestamp in self.receive_all(sock, size):
+            self.handle_packet(port, data, addr, timestamp)
+          continue
+        # apply all packets of one socket as batch, changed clients are notified once
+        self.cl.beginBatch()
+        try:
+          for data, addr, timestamp in self.receive_all(sock, size):
+            self.handle_packet(port, data, addr, timestamp)
+        finally:
+          self.cl.endBatch()
+      if self.pipeline is None:
+        self.cl.gc() # cheap unless a client deadline passed
     logging.debug("main loop finished")
 
-  def handle_keepalive_packet(self, data, addr):
+  # reads all datagrams queued on a non-blocking socket, up to max_batch_size
+  # returns a list of (data, addr, timestamp) tuples, see recvfrom_timestamp
+  def receive_all(self, sock, size):
+    datagrams = []
+    while len(datagrams) < self.max_batch_size:
+      try:
+        datagrams += [recvfrom_timestamp(sock, size)]
+      except BlockingIOError:
+        break
+    return datagrams
+
+  def run_asyncio(self):
+    logging.debug("starting event loop")
+    loop = self.nfs.loop
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(self.open_endpoints())
+    loop.run_forever()
+    loop.run_until_complete(self.close_endpoints())
+    loop.close()
+    logging.debug("event loop finished")
+
+  async def open_endpoints(self):
+    loop = asyncio.get_running_loop()
+    for sock, (port, _) in self.receivers.items():
+      transport, _ = await loop.create_datagram_endpoint(
+        lambda port=port: DatagramHandler(self, port), sock=sock)
+      self.transports += [transport]
+    self.gc_asyncio(loop)
+
+  async def close_endpoints(self):
+    self.gc_handle.cancel()
+    for transport in self.transports:
+      transport.close()
+    self.transports = []
+    await asyncio.sleep(0) # let transports finish closing
+
+  def gc_asyncio(self, loop):
+    if self.pipeline is None:
+      self.cl.gc()
+    self.gc_handle = loop.call_later(self.gc_interval, self.gc_asyncio, loop)
+
+  # entry point for every received datagram, queued for the pipeline or dispatched immediately
+  # timestamp is the arrival time of the packet on the time.monotonic() clock
+  def handle_packet(self, port, data, addr, timestamp):
+    if self.recorder is not None:
+      self.recorder.record(port, data, addr, timestamp)
+    if self.trace is not None:
+      self.trace.record(port, data, addr, timestamp)
+    if self.pipeline is not None:
+      self.pipeline.enqueue(port, data, addr, timestamp)
+    else:
+      self.dispatch_packet(port, data, addr, timestamp)
+
+  # dispatches a datagram by the port it was received on
+  def dispatch_packet(self, port, data, addr, timestamp):
+    self.cl.applyPendingMetadata()
+    if port == self.keepalive_port:
+      self.handle_keepalive_packet(data, addr, timestamp)
+    elif port == self.beat_port:
+      self.handle_beat_packet(data, addr, timestamp)
+    elif port == self.status_port:
+      self.handle_status_packet(data, addr, timestamp)
+    else:
+      logging.warning("Received packet on unknown port %d", port)
+
+  def handle_keepalive_packet(self, data, addr, timestamp=None):
     #logging.debug("Broadcast keepalive packet from {}".format(addr))
+    if timestamp is None:
+      timestamp = time.monotonic()
     try:
-      packet = packets.KeepAlivePacket.parse(data)
+      packet = packets_fast.parse_keepalive_packet(data)
     except Exception as e:
       logging.warning("Failed to parse keepalive packet from {}, {} bytes: {}".format(addr, len(data), e))
-      packets_dump.dump_packet_raw(data)
+      self.dump_parse_error(data)
       return
+    packet.timestamp = timestamp
     # both packet types give us enough information to store the client
     if packet["type"] in ["type_ip", "type_status", "type_change"]:
       self.cl.eatKeepalive(packet)
-    if self.own_ip is None and len(self.cl.getClientIps()) > 0:
+    if self.auto_detect_iface and self.own_ip is None and len(self.cl.getClientIps()) > 0:
       self.own_ip = guess_own_iface(self.cl.getClientIps())
       if self.own_ip is not None:
         logging.info("Guessed own interface {} ip {} mask {} mac {}".format(*self.own_ip))
         self.vcdj_set_iface()
-    packets_dump.dump_keepalive_packet(packet)
 
-  def handle_beat_packet(self, data, addr):
+  def handle_beat_packet(self, data, addr, timestamp=None):
     #logging.debug("Broadcast beat packet from {}".format(addr))
+    if timestamp is None:
+      timestamp = time.monotonic()
     try:
-      packet = packets.BeatPacket.parse(data)
+      packet = packets_fast.parse_beat_packet(data)
     except Exception as e:
       logging.warning("Failed to parse beat packet from {}, {} bytes: {}".format(addr, len(data), e))
-      packets_dump.dump_packet_raw(data)
+      self.dump_parse_error(data)
       return
+    packet.timestamp = timestamp
     if packet["type"] in ["type_beat", "type_absolute_position", "type_mixer"]:
       self.cl.eatBeat(packet)
-    packets_dump.dump_beat_packet(packet)
 
-  def handle_status_packet(self, data, addr):
+  def handle_status_packet(self, data, addr, timestamp=None):
     #logging.debug("Broadcast status packet from {}".format(addr))
+    if timestamp is None:
+      timestamp = time.monotonic()
+    if self.cl.eatUnchangedStatus(data, timestamp):
+      return
     try:
-      packet = packets.StatusPacket.parse(data)
+      packet = packets_fast.parse_status_packet(data)
     except Exception as e:
       logging.warning("Failed to parse status packet from {}, {} bytes: {}".format(addr, len(data), e))
-      packets_dump.dump_packet_raw(data)
+      self.dump_parse_error(data)
       return
-    self.cl.eatStatus(packet)
-    packets_dump.dump_status_packet(packet)
+    packet.timestamp = timestamp
+    self.cl.eatStatus(packet, data)
+
+  def dump_parse_error(self, data):
+    if self.trace is not None and self.trace.dump_on_error:
+      self.trace.dump_error(logging.WARNING)
+    else:
+      packets_dump.dump_packet_raw(data)
+
+  # keep the latest size received datagrams in memory to dump them on demand or on parse errors
+  def enable_tracing(self, size=1000):
+    if self.trace is None or self.trace.entries.maxlen != size:
+      self.trace = PacketTrace(size)
+
+  def disable_tracing(self):
+    self.trace = None
+
+  # record bpm, pitch, position and beat count of every packet in a ring buffer of size rows per client
+  # see TelemetryBuffer for queries, requires numpy
+  def enable_telemetry(self, size=4096):
+    self.cl.telemetry_size = size
+    for c in self.cl.clients:
+      self.cl.createTelemetry(c)
+
+  def disable_telemetry(self):
+    self.cl.telemetry_size = None
+    for c in self.cl.clients:
+      c.telemetry = None
+
+  # returns the predicted time.monotonic() of the count-th next beat (or downbeat if bar is True)
+  # of player_number or the tempo master if None, None if unknown
+  def next_beat_time(self, player_number=None, count=1, bar=False):
+    client = self.cl.getMaster() if player_number is None else self.cl.getClient(player_number)
+    if client is None:
+      return None
+    return predict_beat_time(self, client, count, bar)
+
+  # called on every predicted beat (or downbeat if bar is True) of player_number or the tempo master if None
+  # lead_time seconds ahead of the beat, returns a subscription for unsubscribe_beats
+  # arguments of cb: player number, predicted time.monotonic() of the beat, beat in bar (1..4 or None)
+  def subscribe_beats(self, cb, player_number=None, bar=False, lead_time=0):
+    if self.beat_ticker is None:
+      self.beat_ticker = BeatTicker(self)
+      self.beat_ticker.start()
+    return self.beat_ticker.subscribe(cb, player_number, bar, lead_time)
+
+  def unsubscribe_beats(self, subscription):
+    if self.beat_ticker is not None:
+      self.beat_ticker.unsubscribe(subscription)
+
+  # wraps cb to be called in its own thread instead of the network thread, thus a slow callback
+  # does not delay packet handling, pass the result to the set_*_callback or subscribe_* functions
+  # policy "drop_oldest" or "coalesce" decides what happens if more than size calls are queued,
+  # see CallbackDispatcher for details and dispatch_stats for the lag of each dispatcher
+  def dispatch(self, cb, name=None, size=64, policy="drop_oldest", merge=None, max_rate=None, urgent=None):
+    dispatcher = CallbackDispatcher(cb, name, size, policy, merge, max_rate, urgent)
+    dispatcher.start()
+    self.dispatchers = self.dispatchers+[dispatcher]
+    return dispatcher
+
+  # like dispatch, but combines the calls for each player and calls cb at most max_rate times per second per player
+  # changes of the loaded track or media and removed clients are delivered immediately
+  # use changes=False for set_client_keepalive_callback and set_client_change_callback,
+  # changes=True for subscribe_client_changes to merge the changes of combined calls
+  def throttle(self, cb, max_rate, name=None, changes=False):
+    if changes:
+      return self.dispatch(cb, name, policy="coalesce", merge=merge_changes, max_rate=max_rate, urgent=urgent_changes)
+    return self.dispatch(cb, name, policy="coalesce", max_rate=max_rate,
+      urgent=lambda args: self.cl.hasUrgentChanges(args[0]))
+
+  # called from the DataProvider thread for every loaded track if ClientList.log_played_tracks is set
+  # entries are written asynchronously, query them using journal.query or journal.recent
+  def record_played_track(self, entry):
+    if self.journal is None:
+      self.journal = PlayedTracksJournal(self.journal_filename)
+      self.journal.start()
+    self.journal.record(entry)
+
+  # returns a dict of dispatcher name -> statistics dict
+  def dispatch_stats(self):
+    return {dispatcher.name: dispatcher.stats() for dispatcher in self.dispatchers}
 
   # called whenever a keepalive packet is received
   # arguments of cb: this clientlist object, player number of changed client
@@ -145,6 +422,15 @@ class ProDj(Thread):
   def set_client_change_callback(self, cb=None):
     self.cl.client_change_callback = cb
 
+  # called with the changed fields of a client, optionally only for some fields, a player or the tempo master
+  # arguments of cb: player number of changed client, dict of field -> (old value, new value)
+  # returns a subscription for unsubscribe_client_changes, see ClientList.subscribeChanges
+  def subscribe_client_changes(self, cb, fields=None, player_number=None, master=False):
+    return self.cl.subscribeChanges(cb, fields, player_number, master)
+
+  def unsubscribe_client_changes(self, subscription):
+    self.cl.unsubscribeChanges(subscription)
+
   # called when a player media changes
   # arguments of cb: this clientlist object, player_number, changed slot
   def set_media_change_callback(self, cb=None):
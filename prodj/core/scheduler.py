@@ -0,0 +1,80 @@
+import heapq
+import logging
+import time
+import traceback
+from threading import Condition, Thread
+
+# sends prebuilt packets at given times on the time.monotonic() clock, see Vcdj.schedule_command
+# sleeps until shortly before the send time and busy waits the rest for sub-millisecond precision
+class CommandScheduler(Thread):
+  def __init__(self):
+    super().__init__()
+    self.queue = [] # heap of (send_time, handle, sock, data, addr)
+    self.condition = Condition()
+    self.keep_running = True
+    self.next_handle = 1
+    self.spin_time = 0.002 # seconds of busy waiting before sending
+    self.max_delay = 0.05 # commands which could not be sent within this time are dropped
+    self.sent = 0
+    self.missed = 0
+
+  # returns a handle to cancel the command
+  def schedule(self, send_time, sock, data, addr):
+    with self.condition:
+      handle = self.next_handle
+      self.next_handle += 1
+      heapq.heappush(self.queue, (send_time, handle, sock, data, addr))
+      self.condition.notify()
+    return handle
+
+  # returns True if the command was still pending
+  def cancel(self, handle):
+    with self.condition:
+      queue = [entry for entry in self.queue if entry[1] != handle]
+      if len(queue) == len(self.queue):
+        return False
+      heapq.heapify(queue)
+      self.queue = queue
+      self.condition.notify()
+    return True
+
+  def stop(self):
+    with self.condition:
+      self.keep_running = False
+      self.condition.notify()
+
+  def run(self):
+    logging.debug("command scheduler started")
+    try:
+      while True:
+        with self.condition:
+          while self.keep_running:
+            if len(self.queue) == 0:
+              self.condition.wait()
+              continue
+            timeout = self.queue[0][0]-time.monotonic()-self.spin_time
+            if timeout <= 0:
+              break
+            self.condition.wait(timeout)
+          if not self.keep_running:
+            break
+          send_time, handle, sock, data, addr = heapq.heappop(self.queue)
+        while time.monotonic() < send_time:
+          pass
+        self.send(send_time, sock, data, addr)
+    except Exception as e:
+      logging.critical("Exception in scheduler.run: "+str(e)+"\n"+traceback.format_exc())
+    logging.debug("command scheduler stopped")
+
+  def send(self, send_time, sock, data, addr):
+    delay = time.monotonic()-send_time
+    if delay > self.max_delay:
+      logging.warning("Dropping command to %s which is %.1f ms late", addr[0], delay*1000)
+      self.missed += 1
+      return
+    try:
+      sock.sendto(data, addr)
+    except OSError as e:
+      logging.warning("Failed to send scheduled command to %s: %s", addr[0], e)
+      return
+    self.sent += 1
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from threading import Lock, Thread
+
+from prodj.data.datastore import DataStore, DataStoreView
+
+# resources shared by several ProDj instances in one process, e.g. one per network interface
+# all instances use the same asyncio event loop (nfs downloads and asyncio ingest) and the same
+# data caches, each instance accesses the caches through its own namespace
+# the event loop runs while at least one instance is started
+class SharedResources:
+  def __init__(self):
+    self.loop = asyncio.new_event_loop()
+    self.loop_thread = None
+    self.users = 0
+    self.stores = {} # kind -> DataStore
+    self.store_limits = {} # kind -> size limit of the store per namespace
+    self.namespaces = {} # kind -> set of namespaces using the store
+    self.lock = Lock()
+
+  # returns a view on the shared store of the given kind (e.g. "metadata") for namespace
+  # the size limit of the store grows with the number of namespaces, thus each instance keeps
+  # as many entries as with a store of its own
+  def store(self, kind, namespace):
+    with self.lock:
+      if kind not in self.stores:
+        self.stores[kind] = DataStore()
+        self.store_limits[kind] = self.stores[kind].size_limit
+        self.namespaces[kind] = set()
+      self.namespaces[kind].add(namespace)
+      self.stores[kind].size_limit = self.store_limits[kind]*len(self.namespaces[kind])
+      return DataStoreView(self.stores[kind], namespace)
+
+  def acquire(self):
+    with self.lock:
+      self.users += 1
+      if self.loop_thread is None:
+        logging.debug("starting shared event loop")
+        self.loop_thread = Thread(target=self.loop.run_forever)
+        self.loop_thread.start()
+
+  def release(self):
+    with self.lock:
+      self.users -= 1
+      if self.users > 0 or self.loop_thread is None:
+        return
+      self.loop.call_soon_threadsafe(self.loop.stop)
+      self.loop_thread.join()
+      self.loop_thread = None
+      logging.debug("shared event loop stopped")
+
+  # stops the event loop and the stores, to be called after all instances have been stopped
+  def close(self):
+    if self.loop_thread is not None:
+      self.loop.call_soon_threadsafe(self.loop.stop)
+      self.loop_thread.join()
+      self.loop_thread = None
+    self.loop.close()
+    for store in self.stores.values():
+      store.stop()
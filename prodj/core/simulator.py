@@ -0,0 +1,278 @@
+from threading import Event, Thread
+import logging
+import math
+import socket
+import time
+import traceback
+
+from prodj.network import packets
+
+# properties of simulated player models:
+# remaining_bytes of status packets, is_nexus flag, sends absolute position packets
+SimulatedModels = {
+  "CDJ-2000": (0xb0, 0x05, False),
+  "CDJ-2000NXS": (0xb0, 0x0f, False),
+  "CDJ-2000NXS2": (0xf8, 0x0f, False),
+  "CDJ-3000": (0x438, 0x1f, True)
+}
+
+# a virtual player sending keepalive, beat, status and (cdj-3000) absolute position packets
+# like a real player would do, all state changes are picked up by the next packets
+class SimulatedPlayer:
+  def __init__(self, player_number, ip_addr, model="CDJ-2000NXS2", bpm=128, pitch=1):
+    if model not in SimulatedModels:
+      raise ValueError("Unable to simulate model {}".format(model))
+    self.player_number = player_number
+    self.ip_addr = ip_addr
+    self.mac_addr = "02:00:00:00:00:{:02x}".format(player_number)
+    self.model = model
+    self.remaining_bytes, self.is_nexus, self.absolute_position = SimulatedModels[model]
+    self.bpm = bpm # tempo of the loaded track
+    self.pitch = pitch
+    self.track_id = 0
+    self.track_length = 0 # seconds
+    self.position = 0 # seconds
+    self.playing = False
+    self.master = False
+    self.sync = False
+    self.on_air = False
+    self.usb_loaded = True
+    self.sd_loaded = False
+    self.packet_count = 0
+    self.keepalive_interval = 1.5
+    self.status_interval = 0.2
+    self.absolute_position_interval = 1/30
+    self.sock = None
+    self.target_ip = None
+    self.last_update = None
+    self.next_keepalive = 0
+    self.next_status = 0
+    self.next_absolute_position = 0
+
+  def open(self, target_ip):
+    self.target_ip = target_ip
+    self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    self.sock.bind((self.ip_addr, 0))
+
+  def close(self):
+    if self.sock is not None:
+      self.sock.close()
+      self.sock = None
+
+  def load_track(self, track_id, bpm=None, length=300):
+    logging.debug("simulated player %d loads track %d", self.player_number, track_id)
+    self.track_id = track_id
+    self.track_length = length
+    self.position = 0
+    self.playing = False
+    if bpm is not None:
+      self.bpm = bpm
+
+  def play(self):
+    self.playing = self.track_id != 0
+
+  def pause(self):
+    self.playing = False
+
+  def insert_media(self, slot):
+    setattr(self, slot+"_loaded", True)
+
+  def eject_media(self, slot):
+    setattr(self, slot+"_loaded", False)
+    if self.track_id != 0 and slot == "usb":
+      self.load_track(0)
+
+  def actual_pitch(self):
+    return self.pitch if self.playing else 0
+
+  # beats are counted from 1 at the start of the track
+  def beat_count(self):
+    if self.track_id == 0:
+      return 0
+    return math.floor(self.position*self.bpm/60)+1
+
+  def beat(self):
+    return (self.beat_count()-1)%4+1
+
+  # seconds until the next beat with the current pitch, None if paused
+  def time_to_next_beat(self):
+    if self.actual_pitch() == 0 or self.bpm == 0:
+      return None
+    next_beat_position = self.beat_count()*60/self.bpm
+    return (next_beat_position-self.position)/self.actual_pitch()
+
+  def play_state(self):
+    if self.track_id == 0:
+      return "no_track"
+    if self.position >= self.track_length:
+      return "end_of_track"
+    if self.playing:
+      return "playing"
+    return "cued" if self.position == 0 else "paused"
+
+  # advance the simulation to now and send due packets
+  # returns the time of the next event on the time.monotonic() clock
+  def update(self, now):
+    if self.last_update is not None and self.playing:
+      old_beat_count = self.beat_count()
+      self.position = min(self.position+self.pitch*(now-self.last_update), self.track_length)
+      if self.position >= self.track_length:
+        self.playing = False
+      if self.beat_count() != old_beat_count:
+        self.send_beat_packet()
+    self.last_update = now
+    if now >= self.next_keepalive:
+      self.send_keepalive_packet()
+      self.next_keepalive = now+self.keepalive_interval
+    if now >= self.next_status:
+      self.send_status_packet()
+      self.next_status = now+self.status_interval
+    next_event = min(self.next_keepalive, self.next_status)
+    if self.absolute_position and self.track_id != 0:
+      if now >= self.next_absolute_position:
+        self.send_absolute_position_packet()
+        self.next_absolute_position = now+self.absolute_position_interval
+      next_event = min(next_event, self.next_absolute_position)
+    beat_delay = self.time_to_next_beat()
+    if beat_delay is not None:
+      next_event = min(next_event, now+beat_delay)
+    return next_event
+
+  def send(self, data, port):
+    self.sock.sendto(data, (self.target_ip, port))
+
+  def send_keepalive_packet(self):
+    self.send(packets.KeepAlivePacket.build({
+      "type": "type_status",
+      "subtype": "stype_status",
+      "model": self.model,
+      "content": {
+        "player_number": self.player_number,
+        "ip_addr": self.ip_addr,
+        "mac_addr": self.mac_addr
+      }
+    }), 50000)
+
+  def send_beat_packet(self):
+    period = 60/(self.bpm*self.pitch)*1000
+    bar_beats = 5-self.beat()
+    self.send(packets.BeatPacket.build({
+      "type": "type_beat",
+      "subtype": "stype_beat",
+      "model": self.model,
+      "player_number": self.player_number,
+      "content": {
+        "distances": {
+          "next_beat": round(period),
+          "2nd_beat": round(2*period),
+          "next_bar": round(bar_beats*period),
+          "4th_beat": round(4*period),
+          "2nd_bar": round((bar_beats+4)*period),
+          "8th_beat": round(8*period)
+        },
+        "pitch": self.pitch,
+        "bpm": self.bpm,
+        "beat": self.beat(),
+        "player_number2": self.player_number
+      }
+    }), 50001)
+
+  def send_absolute_position_packet(self):
+    self.send(packets.BeatPacket.build({
+      "type": "type_absolute_position",
+      "subtype": 0x18, # remaining length, absolute position packets have no named subtype
+      "model": self.model,
+      "player_number": self.player_number,
+      "content": {
+        "track_len": round(self.track_length),
+        "playhead": round(self.position*1000),
+        "pitch": round(self.actual_pitch()*100),
+        "bpm": round(self.bpm*10)
+      }
+    }), 50001)
+
+  def send_status_packet(self):
+    self.packet_count += 1
+    loaded = self.track_id != 0
+    content = {
+      "activity": 1 if self.playing else 0,
+      "loaded_player_number": self.player_number if loaded else 0,
+      "loaded_slot": "usb" if loaded else "empty",
+      "track_analyze_type": "rekordbox" if loaded else "unknown",
+      "track_id": self.track_id,
+      "track_number": 1 if loaded else 0,
+      "usb_active": "active" if self.usb_loaded else "inactive",
+      "usb_state": "loaded" if self.usb_loaded else "not_loaded",
+      "sd_state": "loaded" if self.sd_loaded else "not_loaded",
+      "play_state": self.play_state(),
+      "firmware": "1.00",
+      "state": {"on_air": self.on_air, "sync": self.sync, "master": self.master, "play": self.playing},
+      "play_state2": 0xfa if self.playing else 0xfe,
+      "physical_pitch": self.pitch,
+      "bpm": self.bpm if loaded else 655.35,
+      "actual_pitch": self.actual_pitch(),
+      "play_state3": 9 if self.playing else 1,
+      "beat_count": self.beat_count() if loaded else 0xffffffff,
+      "beat": self.beat() if loaded else 0,
+      "physical_pitch2": self.pitch,
+      "actual_pitch2": self.actual_pitch(),
+      "packet_count": self.packet_count,
+      "is_nexus": self.is_nexus
+    }
+    if self.remaining_bytes == 0x438:
+      content.update({"key": "am", "keyshift": "none", "loopStart": 0, "loopEnd": 0, "wholeLoopLength": 0})
+    data = packets.StatusPacket.build({
+      "type": "cdj",
+      "model": self.model,
+      "player_number": self.player_number,
+      "extra": {"remaining_bytes": self.remaining_bytes},
+      "content": content
+    })
+    self.send(data.ljust(0x24+self.remaining_bytes, b"\x00"), 50002)
+
+# simulates several players on loopback or any other interface
+# players get consecutive ips starting at base_ip, which have to be assigned to a local interface
+# (any 127.0.0.0/8 address works on linux loopback), packets are sent to target_ip
+class NetworkSimulator(Thread):
+  def __init__(self, target_ip="127.0.0.1", base_ip="127.0.0.2"):
+    super().__init__()
+    self.target_ip = target_ip
+    self.base_ip = base_ip
+    self.players = []
+    self.event = Event()
+
+  def add_player(self, model="CDJ-2000NXS2", bpm=128, pitch=1):
+    player_number = len(self.players)+1
+    base = socket.inet_aton(self.base_ip)
+    ip_addr = socket.inet_ntoa((int.from_bytes(base, "big")+player_number-1).to_bytes(4, "big"))
+    player = SimulatedPlayer(player_number, ip_addr, model, bpm, pitch)
+    self.players += [player]
+    return player
+
+  def getPlayer(self, player_number):
+    return next((p for p in self.players if p.player_number == player_number), None)
+
+  def start(self):
+    for player in self.players:
+      player.open(self.target_ip)
+    self.event.clear()
+    super().start()
+
+  def stop(self):
+    self.event.set()
+    self.join()
+    for player in self.players:
+      player.close()
+
+  def run(self):
+    logging.info("Simulating %d players, sending to %s", len(self.players), self.target_ip)
+    try:
+      while not self.event.is_set():
+        now = time.monotonic()
+        next_event = now+1
+        for player in self.players:
+          next_event = min(next_event, player.update(now))
+        self.event.wait(max(0, next_event-time.monotonic()))
+    except Exception as e:
+      logging.critical("Exception in simulator.run: "+str(e)+"\n"+traceback.format_exc())
@@ -0,0 +1,63 @@
+import time
+import numpy as np
+
+TelemetryFields = ["timestamp", "bpm", "actual_pitch", "position", "beat_count"]
+TimestampColumn, BpmColumn, PitchColumn, PositionColumn, BeatCountColumn = range(len(TelemetryFields))
+
+def telemetry_value(value):
+  return float(value) if isinstance(value, (int, float)) else np.nan
+
+# fixed size ring buffer of the play state of a client, see ClientList.telemetry_size
+# one row per packet with the columns of TelemetryFields, unknown values are nan
+# only the ingest thread writes, readers copy without locking: the write counter is increased
+# after a row is stored and rows overwritten while copying are dropped from the copy
+class TelemetryBuffer:
+  def __init__(self, size=4096):
+    self.size = size
+    self.data = np.full((size, len(TelemetryFields)), np.nan)
+    self.count = 0 # total number of rows written
+
+  def __len__(self):
+    return min(self.count, self.size-1)
+
+  def append(self, timestamp, bpm, actual_pitch, position, beat_count):
+    self.data[self.count%self.size] = (timestamp, telemetry_value(bpm), telemetry_value(actual_pitch),
+      telemetry_value(position), telemetry_value(beat_count))
+    self.count += 1
+
+  # returns a copy of the rows of the last duration seconds (all if None) in chronological order
+  def samples(self, duration=None, now=None):
+    count = self.count
+    length = min(count, self.size-1) # the oldest row may be written right now
+    rows = self.data[np.arange(count-length, count)%self.size]
+    overwritten = self.count-count
+    if overwritten > 0:
+      rows = rows[overwritten:]
+    if duration is not None:
+      if now is None:
+        now = time.monotonic()
+      rows = rows[rows[:, TimestampColumn] >= now-duration]
+    return rows
+
+  # mean effective tempo (bpm multiplied by pitch) of the last duration seconds, nan if unknown
+  def mean_tempo(self, duration=None, now=None):
+    rows = self.samples(duration, now)
+    tempo = rows[:, BpmColumn]*rows[:, PitchColumn]
+    tempo = tempo[~np.isnan(tempo)]
+    return float(tempo.mean()) if len(tempo) > 0 else np.nan
+
+  # change of the actual pitch per second over the last duration seconds (least squares slope), nan if unknown
+  def pitch_change_rate(self, duration=None, now=None):
+    rows = self.samples(duration, now)
+    rows = rows[~np.isnan(rows[:, PitchColumn])]
+    if len(rows) < 2 or np.ptp(rows[:, TimestampColumn]) == 0:
+      return np.nan
+    return float(np.polyfit(rows[:, TimestampColumn], rows[:, PitchColumn], 1)[0])
+
+  # number of beats played per minute derived from the beat count, nan if unknown
+  def beat_rate(self, duration=None, now=None):
+    rows = self.samples(duration, now)
+    rows = rows[~np.isnan(rows[:, BeatCountColumn])]
+    if len(rows) < 2 or np.ptp(rows[:, TimestampColumn]) == 0:
+      return np.nan
+    return float(np.polyfit(rows[:, TimestampColumn], rows[:, BeatCountColumn], 1)[0]*60)
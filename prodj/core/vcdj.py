@@ -2,8 +2,11 @@ from threading import Event, Thread
 from ipaddress import IPv4Network
 from construct import byte2int
 import logging
+import time
 import traceback
 
+from prodj.core.beats import predict_beat_time
+from prodj.core.scheduler import CommandScheduler
 from prodj.network import packets
 
 class Vcdj(Thread):
@@ -17,6 +20,8 @@ class Vcdj(Thread):
     self.ip_addr = ""
     self.mac_addr = ""
     self.broadcast_addr = ""
+    self.scheduler = None # CommandScheduler, started by the first scheduled command
+    self.command_lead_time = 0 # seconds scheduled commands are sent ahead of the beat
 
   def start(self):
     self.event.clear()
@@ -24,6 +29,10 @@ class Vcdj(Thread):
 
   def stop(self):
     self.event.set()
+    if self.scheduler is not None:
+      self.scheduler.stop()
+      self.scheduler.join()
+      self.scheduler = None
 
   def run(self):
     logging.info("Starting virtual cdj with player number {}".format(self.player_number))
@@ -57,6 +66,9 @@ class Vcdj(Thread):
     self.prodj.keepalive_sock.sendto(raw, (self.broadcast_addr, self.prodj.keepalive_port))
 
   def query_link_info(self, player_number, slot):
+    if len(self.ip_addr) == 0:
+      logging.debug("own interface unknown, not querying link info")
+      return
     cl = self.prodj.cl.getClient(player_number)
     if cl is None:
       logging.warning("Failed to get player %d", player_number)
@@ -78,11 +90,49 @@ class Vcdj(Thread):
     logging.debug("sending link info query to %s", cl.ip_addr)
     self.prodj.status_sock.sendto(data, (cl.ip_addr, self.prodj.status_port))
 
+  # commands are built as (sock, data, addr) tuples, thus they can be sent immediately or scheduled
+  def send_command(self, command):
+    if command is None:
+      return
+    sock, data, addr = command
+    sock.sendto(data, addr)
+
+  # sends command on the count-th next beat (or downbeat if bar is True) of player_number
+  # or the tempo master if player_number is None
+  # returns a handle for cancel_command or None if the beats of the player are unknown
+  def schedule_command(self, command, player_number=None, count=1, bar=False):
+    if command is None:
+      return None
+    if player_number is None:
+      cl = self.prodj.cl.getMaster()
+    else:
+      cl = self.prodj.cl.getClient(player_number)
+    if cl is None:
+      logging.warning("Failed to get %s", "master player" if player_number is None else "player {}".format(player_number))
+      return None
+    beat_time = predict_beat_time(self.prodj, cl, count, bar)
+    if beat_time is None:
+      logging.warning("Beats of player %d unknown, unable to schedule command", cl.player_number)
+      return None
+    if self.scheduler is None:
+      self.scheduler = CommandScheduler()
+      self.scheduler.start()
+    logging.debug("scheduling command to %s in %.1f ms", command[2][0], (beat_time-time.monotonic())*1000)
+    return self.scheduler.schedule(beat_time-self.command_lead_time, *command)
+
+  def cancel_command(self, handle):
+    if self.scheduler is None:
+      return False
+    return self.scheduler.cancel(handle)
+
   def command_load_track(self, player_number, load_player_number, load_slot, load_track_id):
+    self.send_command(self.build_load_track(player_number, load_player_number, load_slot, load_track_id))
+
+  def build_load_track(self, player_number, load_player_number, load_slot, load_track_id):
     cl = self.prodj.cl.getClient(player_number)
     if cl is None:
       logging.warning("Failed to get player %d", player_number)
-      return
+      return None
     load_slot_id = byte2int(packets.PlayerSlot.build(load_slot))
     cmd = {
       "type": "load_cmd",
@@ -96,17 +146,27 @@ class Vcdj(Thread):
       }
     }
     data = packets.StatusPacket.build(cmd)
-    logging.debug("send load packet to %s struct %s", cl.ip_addr, str(cmd))
-    self.prodj.status_sock.sendto(data, (cl.ip_addr, self.prodj.status_port))
+    logging.debug("load packet to %s struct %s", cl.ip_addr, str(cmd))
+    return self.prodj.status_sock, data, (cl.ip_addr, self.prodj.status_port)
 
   # if start is True, start the player, otherwise stop the player
   def command_fader_start_single(self, player_number, start=True):
+    self.send_command(self.build_fader_start_single(player_number, start))
+
+  # e.g. start player 2 on the next downbeat of the master: schedule_fader_start_single(2, bar=True)
+  def schedule_fader_start_single(self, player_number, start=True, sync_player_number=None, count=1, bar=False):
+    return self.schedule_command(self.build_fader_start_single(player_number, start), sync_player_number, count, bar)
+
+  def build_fader_start_single(self, player_number, start=True):
     player_commands = ["ignore"]*4
     player_commands[player_number-1] = "start" if start is True else "stop"
-    self.command_fader_start(player_commands)
+    return self.build_fader_start(player_commands)
 
   # player_commands is an array of size 4 containing "start", "stop" or "ignore"
   def command_fader_start(self, player_commands):
+    self.send_command(self.build_fader_start(player_commands))
+
+  def build_fader_start(self, player_commands):
     cmd = {
       "type": "type_fader_start",
       "subtype": "stype_fader_start",
@@ -117,4 +177,4 @@ class Vcdj(Thread):
       }
     }
     data = packets.BeatPacket.build(cmd)
-    self.prodj.beat_sock.sendto(data, (self.broadcast_addr, self.prodj.beat_port))
+    return self.prodj.beat_sock, data, (self.broadcast_addr, self.prodj.beat_port)
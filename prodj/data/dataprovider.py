@@ -3,7 +3,6 @@ import time
 from threading import Thread
 from queue import Empty, Queue
 
-from .datastore import DataStore
 from .dbclient import DBClient
 from .pdbprovider import PDBProvider
 from .exceptions import TemporaryQueryError, FatalQueryError
@@ -27,13 +26,13 @@ class DataProvider(Thread):
     self.own_player_number = 0
     self.request_retry_count = 3
 
-    self.metadata_store = DataStore() # map of player_number,slot,track_id: metadata
-    self.artwork_store = DataStore() # map of player_number,slot,artwork_id: artwork_data
-    self.waveform_store = DataStore() # map of player_number,slot,track_id: waveform_data
-    self.preview_waveform_store = DataStore() # map of player_number,slot,track_id: preview_waveform_data
-    self.color_waveform_store = DataStore() # map of player_number,slot,track_id: color_waveform_data
-    self.color_preview_waveform_store = DataStore() # map of player_number,slot,track_id: color_preview_waveform_data
-    self.beatgrid_store = DataStore() # map of player_number,slot,track_id: beatgrid_data
+    self.metadata_store = prodj.create_store("metadata") # map of player_number,slot,track_id: metadata
+    self.artwork_store = prodj.create_store("artwork") # map of player_number,slot,artwork_id: artwork_data
+    self.waveform_store = prodj.create_store("waveform") # map of player_number,slot,track_id: waveform_data
+    self.preview_waveform_store = prodj.create_store("preview_waveform") # map of player_number,slot,track_id: preview_waveform_data
+    self.color_waveform_store = prodj.create_store("color_waveform") # map of player_number,slot,track_id: color_waveform_data
+    self.color_preview_waveform_store = prodj.create_store("color_preview_waveform") # map of player_number,slot,track_id: color_preview_waveform_data
+    self.beatgrid_store = prodj.create_store("beatgrid") # map of player_number,slot,track_id: beatgrid_data
 
   def start(self):
     self.keep_running = True
@@ -49,7 +48,8 @@ class DataProvider(Thread):
     self.color_waveform_store.stop()
     self.color_preview_waveform_store.stop()
     self.beatgrid_store.stop()
-    self.join()
+    if self.is_alive(): # not started when replaying captures
+      self.join()
 
   def cleanup_stores_from_changed_media(self, player_number, slot):
     self.metadata_store.removeByPlayerSlot(player_number, slot)
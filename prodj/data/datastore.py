@@ -56,3 +56,35 @@ class DataStore(Thread, dict):
       if keys[0] == player_number and keys[1] == slot:
         logging.debug("delete %s due to media change on player %d slot %s", str(keys), player_number, slot)
         del self[keys]
+
+# view on a DataStore shared by several ProDj instances, see SharedResources
+# all keys are prefixed by the namespace, thus clients of different networks do not collide
+class DataStoreView:
+  def __init__(self, store, namespace):
+    self.store = store
+    self.namespace = namespace
+
+  def __contains__(self, key):
+    return (self.namespace,)+key in self.store
+
+  def __getitem__(self, key):
+    return self.store[(self.namespace,)+key]
+
+  def __setitem__(self, key, val):
+    self.store[(self.namespace,)+key] = val
+
+  def __delitem__(self, key):
+    del self.store[(self.namespace,)+key]
+
+  def __len__(self):
+    return sum(1 for keys in list(self.store) if keys[0] == self.namespace)
+
+  # the shared store is stopped by its owner
+  def stop(self):
+    pass
+
+  def removeByPlayerSlot(self, player_number, slot):
+    for keys in list(self.store):
+      if keys[0] == self.namespace and keys[1] == player_number and keys[2] == slot:
+        logging.debug("delete %s due to media change on player %d slot %s", str(keys), player_number, slot)
+        del self.store[keys]
@@ -394,7 +394,7 @@ class DBClient:
 
   def get_server_port(self, player_number):
     if player_number not in self.remote_ports:
-      client = self.prodj.cl.getClient(player_number)
+      client = self.prodj.cl.snapshot.getClient(player_number)
       if client is None:
         raise TemporaryQueryError("failed to get remote port, player {} unknown".format(player_number))
       sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -486,7 +486,7 @@ class DBClient:
         raise TemporaryQueryError("Connection to player {} lost".format(player_number))
 
   def ensure_request_possible(self, request, player_number):
-    client = self.prodj.cl.getClient(player_number)
+    client = self.prodj.cl.snapshot.getClient(player_number)
     if client is None:
       raise TemporaryQueryError("player {} not found in clientlist".format(player_number))
     critical_requests = ["metadata_request", "artwork_request", "preview_waveform_request", "beatgrid_request", "waveform_request"]
@@ -2,7 +2,6 @@ import logging
 import os
 
 from prodj.data.exceptions import FatalQueryError
-from prodj.data.datastore import DataStore
 from prodj.pdblib.pdbdatabase import PDBDatabase
 from prodj.pdblib.usbanlzdatabase import UsbAnlzDatabase
 from prodj.network.rpcreceiver import ReceiveTimeout
@@ -28,8 +27,8 @@ def wrap_get_name_from_db(call, id):
 class PDBProvider:
   def __init__(self, prodj):
     self.prodj = prodj
-    self.dbs = DataStore() # (player_number,slot) -> PDBDatabase
-    self.usbanlz = DataStore() # (player_number, slot, track_id) -> UsbAnlzDatabase
+    self.dbs = prodj.create_store("pdb") # (player_number,slot) -> PDBDatabase
+    self.usbanlz = prodj.create_store("usbanlz") # (player_number, slot, track_id) -> UsbAnlzDatabase
 
   def cleanup_stores_from_changed_media(self, player_number, slot):
     self.dbs.removeByPlayerSlot(player_number, slot)
@@ -46,10 +45,10 @@ class PDBProvider:
       pass
 
   def download_pdb(self, player_number, slot):
-    player = self.prodj.cl.getClient(player_number)
+    player = self.prodj.cl.snapshot.getClient(player_number)
     if player is None:
       raise FatalQueryError("player {} not found in clientlist".format(player_number))
-    filename = "databases/player-{}-{}.pdb".format(player_number, slot)
+    filename = "databases/{}player-{}-{}.pdb".format(self.prodj.network_name+"-" if self.prodj.network_name else "", player_number, slot)
     self.delete_pdb(filename)
     try:
       try:
@@ -85,7 +84,7 @@ class PDBProvider:
     return db
 
   def download_and_parse_usbanlz(self, player_number, slot, anlz_path):
-    player = self.prodj.cl.getClient(player_number)
+    player = self.prodj.cl.snapshot.getClient(player_number)
     if player is None:
       raise FatalQueryError("player {} not found in clientlist".format(player_number))
     dat = self.prodj.nfs.enqueue_buffer_download(player.ip_addr, slot, anlz_path)
@@ -141,7 +140,7 @@ class PDBProvider:
     return metadata
 
   def get_artwork(self, player_number, slot, artwork_id):
-    player = self.prodj.cl.getClient(player_number)
+    player = self.prodj.cl.snapshot.getClient(player_number)
     if player is None:
       raise FatalQueryError("player {} not found in clientlist".format(player_number))
     db = self.get_db(player_number, slot)
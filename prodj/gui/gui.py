@@ -287,7 +287,7 @@ class PlayerWidget(QFrame):
 
   def downloadTrack(self):
     logging.info("Player %d track download requested", self.player_number)
-    c = self.parent().prodj.cl.getClient(self.player_number)
+    c = self.parent().prodj.cl.snapshot.getClient(self.player_number)
     if c is None:
       logging.error("Download failed, player %d unknown", self.player_number)
       return
@@ -416,7 +416,7 @@ class Gui(QWidget):
 
   def keepalive_slot(self, player_number):
     player = self.create_player(player_number)
-    c = self.prodj.cl.getClient(player_number)
+    c = self.prodj.cl.snapshot.getClient(player_number)
     if c is not None and player is not None:
       player.setPlayerInfo(c.model, c.ip_addr)
 
@@ -427,7 +427,7 @@ class Gui(QWidget):
     player = self.create_player(player_number)
     if player is None:
       return
-    c = self.prodj.cl.getClient(player_number)
+    c = self.prodj.cl.snapshot.getClient(player_number) # consistent copy, the client is modified by the receiving thread
     if c is None:
       self.remove_player(player_number)
       return
@@ -437,8 +437,7 @@ class Gui(QWidget):
     player.setMaster("master" in c.state)
     player.setSync("sync" in c.state)
     player.beat_bar.setBeat(c.beat)
-    player.waveform.changeAutoUpdate(c.supports_absolute_position_packets)
-    player.waveform.setPosition(c.position, c.actual_pitch, c.play_state)
+    player.waveform.setPlayhead(c.playhead) # frozen copy, extrapolated by the waveform timer
     player.waveform.setLoop((c.loop_start, c.loop_end))
     player.setPlayState(c.play_state)
     player.setOnAir(c.on_air)
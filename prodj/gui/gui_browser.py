@@ -135,7 +135,7 @@ class Browser(QWidget):
     self.path.setText("\u27a4".join(self.path_stack))
 
   def mediaMenu(self):
-    c = self.prodj.cl.getClient(self.player_number)
+    c = self.prodj.cl.snapshot.getClient(self.player_number)
     if c is None:
       logging.warning("failed to get client for player %d", self.player_number)
       return
@@ -392,7 +392,7 @@ class Browser(QWidget):
 
   def updateButtons(self):
     for i in range(1,5):
-      self.load_buttons[i-1].setEnabled(self.prodj.cl.getClient(i) is not None)
+      self.load_buttons[i-1].setEnabled(self.prodj.cl.snapshot.getClient(i) is not None)
 
   # special request handling to get into qt gui thread
   # storeRequest is called from outside (non-qt gui)
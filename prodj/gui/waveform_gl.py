@@ -2,6 +2,7 @@
 
 import sys
 import logging
+import time
 from threading import Lock
 from PyQt5.QtCore import pyqtSignal, QSize, Qt
 from PyQt5.QtWidgets import QApplication, QHBoxLayout, QOpenGLWidget, QSlider, QWidget
@@ -34,6 +35,7 @@ class GLWaveformWidget(QOpenGLWidget):
     self.zoom_seconds = 4
     self.loop = None  # tuple(start_sec, end_sec)
     self.pitch = 1 # affects animation speed
+    self.playhead = None # Playhead of the player, if set the position is taken from it instead of setPosition
 
     self.viewport = (50, 40) # viewport +- x, y
     self.waveform_lines_per_x = 150
@@ -84,6 +86,12 @@ class GLWaveformWidget(QOpenGLWidget):
       self.loop = loop
       self.update()
 
+  # follow the position estimate of a player, see Client.playhead
+  def setPlayhead(self, playhead):
+    self.playhead = playhead
+    if self.autoUpdate:
+      self.changeAutoUpdate(False)
+
   # current time in seconds at position marker
   def setPosition(self, position, pitch=1, state="playing"):
     logging.debug("setPosition {} pitch {} state {}".format(position, pitch, state))
@@ -129,7 +137,12 @@ class GLWaveformWidget(QOpenGLWidget):
       self.update()
 
   def timerEvent(self, event):
-    if self.pitch != 0:
+    if self.playhead is not None:
+      position = self.playhead.position_at(time.monotonic())
+      if position is not None and position != self.time_offset:
+        self.time_offset = position
+        self.update()
+    elif self.pitch != 0:
       self.time_offset += self.pitch*self.update_interval_ms / 1000
       self.update()
 
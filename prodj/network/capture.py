@@ -0,0 +1,71 @@
+import logging
+import socket
+import struct
+import time
+
+# capture file format: CaptureMagic followed by records of CaptureRecord and the raw datagram
+# timestamps are the arrival times on the time.monotonic() clock of the recording host
+CaptureMagic = b"PDJCAP\x01"
+CaptureRecord = struct.Struct(">dH4sHH") # timestamp, port, source ip, source port, length
+
+# writes every recorded datagram to a capture file, see ProDj.recorder
+class PacketRecorder:
+  def __init__(self, filename):
+    self.filename = filename
+    self.file = open(filename, "wb")
+    self.file.write(CaptureMagic)
+    self.packet_count = 0
+
+  def record(self, port, data, addr, timestamp):
+    self.file.write(CaptureRecord.pack(timestamp, port, socket.inet_aton(addr[0]), addr[1], len(data)))
+    self.file.write(data)
+    self.packet_count += 1
+
+  def close(self):
+    self.file.close()
+    logging.info("Recorded %d packets to %s", self.packet_count, self.filename)
+
+# yields (timestamp, port, data, addr) for every datagram of a capture file
+def read_capture(filename):
+  with open(filename, "rb") as f:
+    if f.read(len(CaptureMagic)) != CaptureMagic:
+      raise ValueError("{} is not a capture file".format(filename))
+    while True:
+      header = f.read(CaptureRecord.size)
+      if len(header) < CaptureRecord.size:
+        return
+      timestamp, port, ip, src_port, length = CaptureRecord.unpack(header)
+      data = f.read(length)
+      if len(data) < length:
+        logging.warning("Capture file %s is truncated", filename)
+        return
+      yield timestamp, port, data, (socket.inet_ntoa(ip), src_port)
+
+# feeds a capture file into ProDj.handle_packet without any sockets
+# speed is the replay speed relative to the recording, None replays as fast as possible
+# packets get timestamps relative to the replay start, spaced as in the recording regardless of speed
+class PacketReplayer:
+  def __init__(self, prodj, filename, speed=1):
+    self.prodj = prodj
+    self.filename = filename
+    self.speed = speed
+
+  # returns the number of packets and the elapsed time in seconds
+  def replay(self):
+    packet_count = 0
+    start = time.monotonic()
+    first_timestamp = None
+    for timestamp, port, data, addr in read_capture(self.filename):
+      if first_timestamp is None:
+        first_timestamp = timestamp
+      offset = timestamp-first_timestamp
+      if self.speed is not None:
+        delay = start+offset/self.speed-time.monotonic()
+        if delay > 0:
+          time.sleep(delay)
+      self.prodj.handle_packet(port, data, addr, start+offset)
+      packet_count += 1
+    elapsed = time.monotonic()-start
+    logging.info("Replayed %d packets in %.3fs (%.0f packets/s)", packet_count, elapsed,
+      packet_count/elapsed if elapsed > 0 else 0)
+    return packet_count, elapsed
@@ -25,3 +25,17 @@ def guess_own_iface(match_ips):
         return iface, addr['addr'], addr['netmask'], mac
 
   return None
+
+# returns the same tuple as guess_own_iface for the first ipv4 address of iface
+def get_iface_data(iface):
+  if iface not in ni.interfaces():
+    return None
+  ifa = ni.ifaddresses(iface)
+  mac = ifa[ni.AF_LINK][0]['addr'] if len(ifa.get(ni.AF_LINK, [])) > 0 else "00:00:00:00:00:00"
+  for addr in ifa.get(ni.AF_INET, []):
+    if 'addr' in addr and 'netmask' in addr:
+      return iface, addr['addr'], addr['netmask'], mac
+  return None
+
+def broadcast_address(ip, netmask):
+  return str(IPv4Network(ip+"/"+netmask, strict=False).broadcast_address)
@@ -11,9 +11,11 @@ from .rpcreceiver import RpcReceiver
 from .nfsdownload import NfsDownload, generic_file_download_done_callback
 
 class NfsClient:
-  def __init__(self, prodj):
+  # if loop is given, it is run by the caller (e.g. SharedResources)
+  def __init__(self, prodj, loop=None):
     self.prodj = prodj
-    self.loop = asyncio.new_event_loop()
+    self.loop = loop if loop is not None else asyncio.new_event_loop()
+    self.loop_thread = None
     self.receiver = RpcReceiver()
 
     self.rpc_auth_stamp = 0xdeadbeef
@@ -28,14 +30,19 @@ class NfsClient:
 
     self.setDownloadChunkSize(1280) # + 142 bytes total overhead is still safe below 1500
 
-  def start(self):
+  # if run_loop is False, the event loop has to be run by the caller
+  def start(self, run_loop=True):
     self.openSockets()
-    self.loop_thread = Thread(target=self.loop.run_forever)
-    self.loop_thread.start()
+    if run_loop:
+      self.loop_thread = Thread(target=self.loop.run_forever)
+      self.loop_thread.start()
     self.receiver.start(self.loop)
 
   def stop(self):
     self.receiver.stop(self.loop)
+    if self.loop_thread is None: # loop is run by the caller, it is responsible for stopping it
+      self.loop.call_soon_threadsafe(self.closeSockets)
+      return
     self.loop.call_soon_threadsafe(self.loop.stop)
     self.loop_thread.join()
     self.loop.close()
@@ -44,7 +51,8 @@ class NfsClient:
   def openSockets(self):
     self.rpc_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     self.rpc_sock.bind(("0.0.0.0", 0))
-    self.loop.add_reader(self.rpc_sock, self.receiver.socketRead, self.rpc_sock)
+    # the loop may already be running in another thread
+    self.loop.call_soon_threadsafe(self.loop.add_reader, self.rpc_sock, self.receiver.socketRead, self.rpc_sock)
 
   def closeSockets(self):
     self.loop.remove_reader(self.rpc_sock)
@@ -2,13 +2,16 @@
 # https://github.com/brunchboy/dysentery
 # https://bitbucket.org/awwright/libpdjl
 
-from construct import Adapter, Array, Byte, Bytes, Const, CString, Default, Enum, ExprAdapter, FlagsEnum, FocusedSeq, GreedyBytes, GreedyRange, Int8ub, Int16ub, Int32ub, Int64ub, Int16ul, Int32ul, Padded, Padding, Pass, PascalString, PaddedString, Prefixed, Rebuild, Struct, Subconstruct, Switch, StopIf, this, len_
+from construct import Adapter, Array, Byte, Bytes, Const, CString, Default, Enum, ExprAdapter, FixedSized, FlagsEnum, FocusedSeq, GreedyBytes, GreedyRange, Int8ub, Int16ub, Int32ub, Int64ub, Int16ul, Int32ul, Padding, Pass, PascalString, PaddedString, Prefixed, Rebuild, Struct, Subconstruct, Switch, StopIf, this, len_
 
 class IpAddrAdapter(Adapter):
   def _encode(self, obj, context, path):
     return list(map(int, obj.split(".")))
   def _decode(self, obj, context, path):
     return ".".join("{}".format(x) for x in obj)
+  # _emitparse is used by compiled structs, see prodj.core.compiled
+  def _emitparse(self, code):
+    return f"'.'.join(map(str, {self.subcon._compileparse(code)}))"
 IpAddr = IpAddrAdapter(Byte[4])
 
 class MacAddrAdapter(Adapter):
@@ -16,6 +19,8 @@ class MacAddrAdapter(Adapter):
     return list(int(x,16) for x in obj.split(":"))
   def _decode(self, obj, context, path):
     return ":".join("{:02x}".format(x) for x in obj)
+  def _emitparse(self, code):
+    return f"':'.join('%02x' % x for x in {self.subcon._compileparse(code)})"
 MacAddr = MacAddrAdapter(Byte[6])
 
 KeepAlivePacketType = Enum(Int8ub,
@@ -61,7 +66,7 @@ KeepAlivePacket = Struct(
   "magic" / UdpMagic,
   "type" / KeepAlivePacketType, # pairs with subtype
   Padding(1),
-  "model" / Padded(20, CString(encoding="ascii")),
+  "model" / FixedSized(20, CString(encoding="ascii")),
   "u1" / Const(1, Int8ub),
   "device_type" / Default(DeviceType, "cdj"),
   Padding(1),
@@ -105,16 +110,20 @@ KeepAlivePacket = Struct(
 
 class PitchAdapter(Adapter):
   def _encode(self, obj, context, path):
-    return obj*0x100000
+    return round(obj*0x100000)
   def _decode(self, obj, context, path):
     return obj/0x100000
+  def _emitparse(self, code):
+    return f"({self.subcon._compileparse(code)})/0x100000"
 Pitch = PitchAdapter(Int32ub)
 
 class BpmAdapter(Adapter):
   def _encode(self, obj, context, path):
-    return obj*100
+    return round(obj*100)
   def _decode(self, obj, context, path):
     return obj/100
+  def _emitparse(self, code):
+    return f"({self.subcon._compileparse(code)})/100"
 Bpm = BpmAdapter(Int16ub)
 
 BeatPacketType = Enum(Int8ub,
@@ -142,7 +151,7 @@ FaderStartCommand = Enum(Int8ub,
 BeatPacket = Struct(
   "magic" / UdpMagic,
   "type" / BeatPacketType, # pairs with subtype
-  "model" / Padded(20, CString(encoding="ascii")),
+  "model" / FixedSized(20, CString(encoding="ascii")),
   "u1" / Default(Int16ub, 256), # 256 for cdjs, 257 for rekordbox
   "player_number" / Int8ub,
   "u2" / Const(0, Int8ub),
@@ -313,6 +322,8 @@ class StateMaskAdapter(Adapter):
     return obj | 0x84 # add bits which are always 1
   def _decode(self, obj, context, path):
     return obj
+  def _emitparse(self, code):
+    return self.subcon._compileparse(code)
 StateMask = FlagsEnum(StateMaskAdapter(Int16ub),
   on_air = 8,
   sync = 16,
@@ -323,7 +334,7 @@ StateMask = FlagsEnum(StateMaskAdapter(Int16ub),
 StatusPacket = Struct(
   "magic" / UdpMagic,
   "type" / StatusPacketType,
-  "model" / Padded(20, CString(encoding="ascii")),
+  "model" / FixedSized(20, CString(encoding="ascii")),
   "u1" / Const(1, Int8ub),
   "u2" / Default(Int8ub, 4), # some kind of revision? 3 for cdj2000nx, 4 for xdj1000. 1 for djm/rekordbox, 0 for link query
   "player_number" / Int8ub, # 0x11 for rekordbox
@@ -388,15 +399,15 @@ StatusPacket = Struct(
       "packet_count" / Default(Int32ub, 0), # permanently increasing
       "is_nexus" / Default(Int8ub, 0x0f), # 0x0f=nexus, 0x05=non-nexus player, 0x1f for cdj-3000 and xdj-xz
       StopIf(this._.extra.remaining_bytes != 0x438), # cdj-3000
-      Bytes(143),  # Accepts any bytes instead of padding with null bytes
+      Default(Bytes(143), bytes(143)),  # Accepts any bytes instead of padding with null bytes
       "key" / KeyValue,  # key of the track, keyshift not applied
       Padding(4),
       "keyshift" / KeyShift, # keyshift of the track
-      Bytes(76),
+      Default(Bytes(76), bytes(76)),
       "loopStart" / Int32ub, # loop start position in ms, mul by 0.65536 to get it
       Padding(4),
       "loopEnd" / Int32ub, # loop end position in ms, mul by 0.65536 to get it
-      Bytes(4),
+      Default(Bytes(4), bytes(4)),
       "wholeLoopLength" / Int16ub, # number of whole beats in the loop (minimum 1)
       ),
       # 4 bytes padding for 2000nxs or newer, cdj2000 does not have this
@@ -491,6 +502,16 @@ class DBFieldFixedAdapter(Adapter):
     if obj["type"] != self.ftype:
       raise TypeError("Parsed type {} but expected {}".format(obj["type"], self.ftype))
     return obj["value"]
+  def _emitparse(self, code):
+    fname = f"parse_dbfieldfixed_{code.allocateId()}"
+    code.append(f"""
+      def {fname}(io, this):
+        obj = {self.subcon._compileparse(code)}
+        if obj["type"] != {self.ftype!r}:
+          raise TypeError("Parsed type {{}} but expected {{}}".format(obj["type"], {self.ftype!r}))
+        return obj["value"]
+    """)
+    return f"{fname}(io, this)"
 DBFieldFixed = lambda x: DBFieldFixedAdapter(DBField, x)
 
 DBMessageFieldType = Enum(Int8ub,
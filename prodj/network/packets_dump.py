@@ -3,66 +3,66 @@ import logging
 def pretty_flags(flags):
   return "|".join(x for x,y in flags.items() if y and x[0] != "_")
 
-# dump functions for debugging
-def dump_keepalive_packet(packet):
-  if logging.getLogger().getEffectiveLevel() > 5:
+# dump functions for debugging, used by PacketTrace.dump
+def dump_keepalive_packet(packet, level=5):
+  if not logging.getLogger().isEnabledFor(level):
     return
   if packet.subtype == "stype_status":
-    logging.log(5, "keepalive {} model {} ({}) player {} ip {} mac {} devcnt {} u2 {} flags {}".format(
+    logging.log(level, "keepalive {} model {} ({}) player {} ip {} mac {} devcnt {} u2 {} flags {}".format(
       packet.subtype, packet.model, packet.device_type, packet.content.player_number, packet.content.ip_addr,
       packet.content.mac_addr, packet.content.device_count, packet.content.u2, pretty_flags(packet.content.flags)
     ))
   elif packet.subtype == "stype_ip":
-    logging.log(5, "keepalive {} model {} ({}) player {} ip {} mac {} iteration {} assignment {} flags {}".format(
+    logging.log(level, "keepalive {} model {} ({}) player {} ip {} mac {} iteration {} assignment {} flags {}".format(
       packet.subtype, packet.model, packet.device_type, packet.content.player_number, packet.content.ip_addr,
       packet.content.mac_addr, packet.content.iteration, packet.content.player_number_assignment, pretty_flags(packet.content.flags)
     ))
   elif packet.subtype == "stype_mac":
-    logging.log(5, "keepalive {} model {} ({}) mac {} iteration {} flags {}".format(
+    logging.log(level, "keepalive {} model {} ({}) mac {} iteration {} flags {}".format(
       packet.subtype, packet.model, packet.device_type, packet.content.mac_addr,
       packet.content.iteration, pretty_flags(packet.content.flags)
     ))
   elif packet.subtype == "stype_number":
-    logging.log(5, "keepalive {} model {} ({}) proposed_player_number {} iteration {}".format(
+    logging.log(level, "keepalive {} model {} ({}) proposed_player_number {} iteration {}".format(
       packet.subtype, packet.model, packet.device_type, packet.content.proposed_player_number,
       packet.content.iteration
     ))
   elif packet.subtype == "stype_hello":
-    logging.log(5, "keepalive {} model {} ({}) u2 {}".format(
+    logging.log(level, "keepalive {} model {} ({}) u2 {}".format(
       packet.subtype, packet.model, packet.device_type, packet.content.u2
     ))
   else:
     logging.warning("BUG: unhandled packet type {}".format(packet.subtype))
 
-def dump_beat_packet(packet):
-  if logging.getLogger().getEffectiveLevel() > 5:
+def dump_beat_packet(packet, level=5):
+  if not logging.getLogger().isEnabledFor(level):
     return
   if packet.type == "type_beat":
-      logging.log(5, "beat {} player {} actual_pitch {:.3f} bpm {:.2f} beat {} player2 {} distances {}".format(
+      logging.log(level, "beat {} player {} actual_pitch {:.3f} bpm {:.2f} beat {} player2 {} distances {}".format(
       packet.model, packet.player_number, packet.content.pitch, packet.content.bpm, packet.content.beat,
       packet.content.player_number2, "/".join([str(y) for x,y in packet.content.distances.items()])
     ))
 
-def dump_status_packet(packet):
-  if logging.getLogger().getEffectiveLevel() > 5 or packet.type not in ["djm", "cdj"]:
+def dump_status_packet(packet, level=5):
+  if not logging.getLogger().isEnabledFor(level) or packet.type not in ["djm", "cdj"]:
     return
-  logging.log(5, "type {} model \"{}\" pn {} u1 {} u2 {} remaining_bytes {}".format(packet.type, packet.model,
+  logging.log(level, "type {} model \"{}\" pn {} u1 {} u2 {} remaining_bytes {}".format(packet.type, packet.model,
     packet.player_number, packet.u1, packet.u2, packet.extra.remaining_bytes if "remaining_bytes" in packet.extra else "N/A"))
-  logging.log(5, "state {} pitch {:.2f} bpm {} beat {} u5 {}".format(
+  logging.log(level, "state {} pitch {:.2f} bpm {} beat {} u5 {}".format(
     ",".join(x for x,y in packet.content.state.items() if y==True),
     packet.content.physical_pitch, packet.content.bpm, packet.content.beat, packet.content.u5))
   if packet.type == "cdj":
-    logging.log(5, "active {} ldpn {} lds {} tat {} tid {} tn {} link {} tmc {} fw {} usb {}/{}".format(
+    logging.log(level, "active {} ldpn {} lds {} tat {} tid {} tn {} link {} tmc {} fw {} usb {}/{}".format(
       packet.content.activity, packet.content.loaded_player_number, packet.content.loaded_slot,
       packet.content.track_analyze_type, packet.content.track_id, packet.content.track_number, packet.content.link_available,
       packet.content.tempo_master_count, packet.content.firmware, packet.content.usb_state, packet.content.usb_active))
-    logging.log(5, "pstate {} pstate2 {} pstate3 {} pitch {:.2f} {:.2f} {:.2f} {:.2f} bpm {} ({}) beat {}/{} cue {}".format(
+    logging.log(level, "pstate {} pstate2 {} pstate3 {} pitch {:.2f} {:.2f} {:.2f} {:.2f} bpm {} ({}) beat {}/{} cue {}".format(
       packet.content.play_state, packet.content.play_state2, packet.content.play_state3,
       packet.content.actual_pitch, packet.content.actual_pitch2, packet.content.physical_pitch, packet.content.physical_pitch2,
       packet.content.bpm, packet.content.bpm_state, packet.content.beat_count, packet.content.beat, packet.content.cue_distance))
-    logging.log(5, "u5 {} u6 {} u7 {} u8 {} u9 {} u10 {} u11 {} is_nexus {:x}".format(packet.content.u5, packet.content.u6,
+    logging.log(level, "u5 {} u6 {} u7 {} u8 {} u9 {} u10 {} u11 {} is_nexus {:x}".format(packet.content.u5, packet.content.u6,
       packet.content.u7, packet.content.u8, packet.content.u9, packet.content.u10, packet.content.u11, packet.content.is_nexus))
 
-def dump_packet_raw(data):
-  # warning level to get message in case of decoding errors
-  logging.warning(" ".join("{:02x}".format(b) for b in data))
+def dump_packet_raw(data, level=logging.DEBUG):
+  if logging.getLogger().isEnabledFor(level):
+    logging.log(level, data.hex(" "))
@@ -0,0 +1,367 @@
+# fast decoders for the packets received most frequently on ports 50000-50002
+# they use precompiled struct.Struct objects at fixed offsets and return lazy views
+# on the received buffer with the same field names as the construct definitions in
+# packets.py, which stay the reference implementation and are used for any layout
+# not handled here
+
+import re
+import struct
+from construct import Container, EnumInteger
+
+from prodj.network import packets
+
+UdpMagicBytes = b"Qspt1WmJOL"
+
+def enum_decoder(enum):
+  mapping = enum.decmapping
+  def decode(value):
+    decoded = mapping.get(value)
+    return decoded if decoded is not None else EnumInteger(value)
+  return decode
+
+def flags_decoder(flags_enum):
+  flags = list(flags_enum.flags.items())
+  def decode(value):
+    obj = Container(_flagsenum=True)
+    for name, flag in flags:
+      obj[name] = value & flag == flag
+    return obj
+  return decode
+
+def ascii_string(value):
+  return value.rstrip(b"\x00").decode("ascii")
+
+def cstring(value):
+  end = value.find(b"\x00")
+  if end < 0:
+    raise ValueError("unterminated string")
+  return value[:end].decode("ascii")
+
+def ip_addr(value):
+  return "{}.{}.{}.{}".format(*value)
+
+def mac_addr(value):
+  return ":".join("{:02x}".format(x) for x in value)
+
+def pitch(value):
+  return value/0x100000
+
+def bpm(value):
+  return value/100
+
+FieldCodes = re.compile(r"(\d*)([xcbB?hHiIlLqQefds])")
+
+# a precompiled layout: struct format plus one (name, converter) tuple per unpacked value
+# converter may be None if the raw value is used as-is
+# every field gets its own unpack function and offset, so it can be decoded independently
+class Layout:
+  def __init__(self, fmt, fields, offset=0):
+    self.offset = offset
+    self.end = offset+struct.calcsize(fmt)
+    self.fields = {}
+    fields = iter(fields)
+    pos = offset
+    for count, code in FieldCodes.findall(fmt):
+      count = int(count) if count else 1
+      if code == "x":
+        pos += count
+        continue
+      for subfmt in [">{}s".format(count)] if code == "s" else [">"+code]*count:
+        name, conv = next(fields)
+        field_struct = struct.Struct(subfmt)
+        self.fields[name] = (field_struct.unpack_from, pos, conv)
+        pos += field_struct.size
+    if next(fields, None) is not None or pos != self.end:
+      raise ValueError("Layout {} does not match its fields".format(fmt))
+
+# read-only view on a received packet, decoding each field on first access only
+# nested structs (extra, content, ...) are views on the same buffer
+class PacketView:
+  def __init__(self, data, fields):
+    self._data = data
+    self._fields = fields
+
+  def __getattr__(self, name):
+    if name[0] == "_":
+      raise AttributeError(name)
+    try:
+      field = self._fields[name]
+    except KeyError:
+      raise AttributeError(name) from None
+    if type(field) is dict:
+      value = PacketView(self._data, field)
+    else:
+      unpack, offset, conv = field
+      value = unpack(self._data, offset)[0]
+      if conv is not None:
+        value = conv(value)
+    self.__dict__[name] = value
+    return value
+
+  def __getitem__(self, name):
+    try:
+      return getattr(self, name)
+    except AttributeError:
+      raise KeyError(name) from None
+
+  def __contains__(self, name):
+    return name in self._fields
+
+  def __iter__(self):
+    return iter(self._fields)
+
+  def __len__(self):
+    return len(self._fields)
+
+  def keys(self):
+    return self._fields.keys()
+
+  def items(self):
+    return [(name, getattr(self, name)) for name in self._fields]
+
+  def __repr__(self):
+    return "PacketView({})".format(", ".join("{}={!r}".format(*x) for x in self.items()))
+
+KeepAliveHeader = Layout(">10sBx20sBBxB", [
+  ("magic", ascii_string),
+  ("type", enum_decoder(packets.KeepAlivePacketType)),
+  ("model", cstring),
+  ("u1", None),
+  ("device_type", enum_decoder(packets.DeviceType)),
+  ("subtype", enum_decoder(packets.KeepAlivePacketSubtype))
+])
+
+KeepAliveContent = {
+  "type_hello": Layout(">B", [
+    ("u2", None)], KeepAliveHeader.end),
+  "type_number": Layout(">BB", [
+    ("proposed_player_number", None),
+    ("iteration", None)], KeepAliveHeader.end),
+  "type_mac": Layout(">BB6s", [
+    ("iteration", None),
+    ("flags", flags_decoder(packets.StatusFeatureFlags)),
+    ("mac_addr", mac_addr)], KeepAliveHeader.end),
+  "type_ip": Layout(">4s6sBBBB", [
+    ("ip_addr", ip_addr),
+    ("mac_addr", mac_addr),
+    ("player_number", None),
+    ("iteration", None),
+    ("flags", flags_decoder(packets.StatusFeatureFlags)),
+    ("player_number_assignment", enum_decoder(packets.PlayerNumberAssignment))], KeepAliveHeader.end),
+  "type_status": Layout(">BB6s4sB3xBB", [
+    ("player_number", None),
+    ("u2", None),
+    ("mac_addr", mac_addr),
+    ("ip_addr", ip_addr),
+    ("device_count", None),
+    ("flags", flags_decoder(packets.StatusFeatureFlags)),
+    ("u4", None)], KeepAliveHeader.end),
+  "type_change": Layout(">B4s", [
+    ("old_player_number", None),
+    ("ip_addr", ip_addr)], KeepAliveHeader.end)
+}
+
+BeatHeader = Layout(">10sB20sHBBB", [
+  ("magic", ascii_string),
+  ("type", enum_decoder(packets.BeatPacketType)),
+  ("model", cstring),
+  ("u1", None),
+  ("player_number", None),
+  ("u2", None),
+  ("subtype", enum_decoder(packets.BeatPacketSubtype))
+])
+
+BeatDistances = Layout(">6I", [
+  ("next_beat", None),
+  ("2nd_beat", None),
+  ("next_bar", None),
+  ("4th_beat", None),
+  ("2nd_bar", None),
+  ("8th_beat", None)], BeatHeader.end)
+
+BeatContent = {
+  "type_beat": Layout(">24xI2xHB2xB", [
+    ("pitch", pitch),
+    ("bpm", bpm),
+    ("beat", None),
+    ("player_number2", None)], BeatDistances.end),
+  "type_absolute_position": Layout(">III8xI", [
+    ("track_len", None),
+    ("playhead", None),
+    ("pitch", None),
+    ("bpm", None)], BeatHeader.end),
+  "type_mixer": Layout(">4s", [
+    ("ch_on_air", list)], BeatHeader.end),
+  "type_mixer_unknown": Layout(">BB", [
+    ("u3", None),
+    ("player_number2", None)], BeatHeader.end),
+  "type_fader_start": Layout(">4s", [
+    ("player", lambda x: [enum_decoder(packets.FaderStartCommand)(y) for y in x])], BeatHeader.end)
+}
+
+StatusHeader = Layout(">10sB20sBBB", [
+  ("magic", ascii_string),
+  ("type", enum_decoder(packets.StatusPacketType)),
+  ("model", cstring),
+  ("u1", None),
+  ("u2", None),
+  ("player_number", None)
+])
+
+StatusExtra = Layout(">HBB", [
+  ("remaining_bytes", None),
+  ("player_number2", None),
+  ("u4", None)], StatusHeader.end)
+
+StatusContentCdj = Layout(">HBBBxIIIII4xI32x2xBBIIII4s4xIHBBIHHIIHBxIHB15xH8xIIIB", [
+  ("activity", None),
+  ("loaded_player_number", None),
+  ("loaded_slot", enum_decoder(packets.PlayerSlot)),
+  ("track_analyze_type", enum_decoder(packets.TrackAnalyzeType)),
+  ("track_id", None),
+  ("track_number", None),
+  ("u5", None),
+  ("u6", None),
+  ("u7", None),
+  ("u8", None),
+  ("usb_active", enum_decoder(packets.ActivityIndicator)),
+  ("sd_active", enum_decoder(packets.ActivityIndicator)),
+  ("usb_state", enum_decoder(packets.StorageIndicator)),
+  ("sd_state", enum_decoder(packets.StorageIndicator)),
+  ("link_available", None),
+  ("play_state", enum_decoder(packets.PlayState)),
+  ("firmware", ascii_string),
+  ("tempo_master_count", None),
+  ("state", flags_decoder(packets.StateMask)),
+  ("u9", None),
+  ("play_state2", None),
+  ("physical_pitch", pitch),
+  ("bpm_state", enum_decoder(packets.BpmState)),
+  ("bpm", bpm),
+  ("u13", None),
+  ("actual_pitch", pitch),
+  ("play_state3", None),
+  ("u10", None),
+  ("beat_count", None),
+  ("cue_distance", None),
+  ("beat", None),
+  ("u11", None),
+  ("physical_pitch2", pitch),
+  ("actual_pitch2", pitch),
+  ("packet_count", None),
+  ("is_nexus", None)], StatusExtra.end)
+
+# additional fields of the cdj-3000, present if remaining_bytes is 0x438
+StatusContentCdj3000 = Layout(">143xI4xQ76xI4xI4xH", [
+  ("key", enum_decoder(packets.KeyValue)),
+  ("keyshift", enum_decoder(packets.KeyShift)),
+  ("loopStart", None),
+  ("loopEnd", None),
+  ("wholeLoopLength", None)], StatusContentCdj.end)
+
+StatusContentDjm = Layout(">HIHH7xB", [
+  ("state", flags_decoder(packets.StateMask)),
+  ("physical_pitch", pitch),
+  ("u5", None),
+  ("bpm", bpm),
+  ("beat", None)], StatusExtra.end)
+
+StatusContent = {
+  "cdj": StatusContentCdj,
+  "djm": StatusContentDjm
+}
+
+# field maps by raw type byte, with the minimal packet length required by each
+KeepAlivePacketFields = {
+  packets.KeepAlivePacketType.encmapping[name]: (
+    {**KeepAliveHeader.fields, "content": layout.fields}, layout.end)
+  for name, layout in KeepAliveContent.items()
+}
+
+BeatPacketFields = {
+  packets.BeatPacketType.encmapping[name]: (
+    {**BeatHeader.fields, "content": layout.fields}, layout.end)
+  for name, layout in BeatContent.items()
+}
+BeatPacketFields[packets.BeatPacketType.encmapping["type_beat"]][0]["content"] = {
+  "distances": BeatDistances.fields, **BeatContent["type_beat"].fields}
+
+StatusPacketFields = {
+  packets.StatusPacketType.encmapping[name]: (
+    {**StatusHeader.fields, "extra": StatusExtra.fields, "content": layout.fields}, layout.end)
+  for name, layout in StatusContent.items()
+}
+StatusPacketFieldsCdj3000 = (
+  {**StatusHeader.fields, "extra": StatusExtra.fields,
+    "content": {**StatusContentCdj.fields, **StatusContentCdj3000.fields}},
+  StatusContentCdj3000.end)
+StatusTypeCdj = packets.StatusPacketType.encmapping["cdj"]
+
+# the decode_* functions return a PacketView on data
+# or None if the packet has to be parsed by construct
+def decode_keepalive_packet(data):
+  data = memoryview(data)
+  if len(data) < KeepAliveHeader.end or data[:10] != UdpMagicBytes or data[32] != 1:
+    return None
+  fields, end = KeepAlivePacketFields.get(data[10], (None, 0))
+  if fields is None or len(data) < end:
+    return None
+  return PacketView(data, fields)
+
+def decode_beat_packet(data):
+  data = memoryview(data)
+  if len(data) < BeatHeader.end or data[:10] != UdpMagicBytes or data[34] != 0:
+    return None
+  fields, end = BeatPacketFields.get(data[10], (None, 0))
+  if fields is None or len(data) < end:
+    return None
+  return PacketView(data, fields)
+
+def decode_status_packet(data):
+  data = memoryview(data)
+  if len(data) < StatusExtra.end or data[:10] != UdpMagicBytes or data[31] != 1:
+    return None
+  fields, end = StatusPacketFields.get(data[10], (None, 0))
+  if data[10] == StatusTypeCdj and data[34:36] == b"\x04\x38":
+    fields, end = StatusPacketFieldsCdj3000
+  if fields is None or len(data) < end:
+    return None
+  return PacketView(data, fields)
+
+# the parse_* functions are drop-in replacements for packets.*.parse
+def parse_keepalive_packet(data):
+  packet = decode_keepalive_packet(data)
+  return packet if packet is not None else packets.KeepAlivePacket.parse(data)
+
+def parse_beat_packet(data):
+  packet = decode_beat_packet(data)
+  return packet if packet is not None else packets.BeatPacket.parse(data)
+
+def parse_status_packet(data):
+  packet = decode_status_packet(data)
+  return packet if packet is not None else packets.StatusPacket.parse(data)
+
+# fields of cdj status packets which change without any change of the player state
+StatusVolatileFields = ["u9", "packet_count"]
+
+def volatile_ranges(layout, names):
+  ranges = []
+  for name in names:
+    unpack, offset, conv = layout.fields[name]
+    ranges += [(offset, offset+unpack.__self__.size)]
+  return sorted(ranges)
+
+def stable_slices(ranges):
+  slices, start = [], 0
+  for begin, end in ranges:
+    slices += [slice(start, begin)]
+    start = end
+  return slices + [slice(start, None)]
+
+StatusStableSlices = stable_slices(volatile_ranges(StatusContentCdj, StatusVolatileFields))
+
+# returns the status packet data without its volatile fields, e.g. to detect repeated packets
+def strip_volatile_status_bytes(data):
+  if len(data) < StatusContentCdj.end or data[10] != StatusTypeCdj:
+    return bytes(data)
+  return b"".join(data[x] for x in StatusStableSlices)
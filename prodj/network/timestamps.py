@@ -0,0 +1,37 @@
+import socket
+import struct
+import sys
+import time
+
+# kernel receive timestamps (SO_TIMESTAMPNS) are only used on linux
+# python does not export the constant, 35 is SO_TIMESTAMPNS(_OLD) from asm-generic/socket.h
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+ReceiveTimestampsSupported = sys.platform.startswith("linux") and hasattr(socket.socket, "recvmsg")
+Timespec = struct.Struct("@ll")
+AncillaryBufferSize = socket.CMSG_SPACE(Timespec.size) if ReceiveTimestampsSupported else 0
+
+# returns True if the kernel will timestamp datagrams received by sock
+def enable_receive_timestamps(sock):
+  if not ReceiveTimestampsSupported:
+    return False
+  try:
+    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+  except OSError:
+    return False
+  return True
+
+# receive a datagram and its arrival time on the time.monotonic() clock
+# the kernel timestamp is wall clock time, thus it is converted using the age of the datagram
+# falls back to the time of reading if no kernel timestamp is available
+def recvfrom_timestamp(sock, size):
+  if not ReceiveTimestampsSupported:
+    data, addr = sock.recvfrom(size)
+    return data, addr, time.monotonic()
+  data, ancdata, flags, addr = sock.recvmsg(size, AncillaryBufferSize)
+  now = time.monotonic()
+  for level, cmsg_type, value in ancdata:
+    if level == socket.SOL_SOCKET and cmsg_type == SO_TIMESTAMPNS and len(value) >= Timespec.size:
+      sec, nsec = Timespec.unpack_from(value)
+      age = time.time()-(sec+nsec/1e9)
+      return data, addr, now-max(age, 0)
+  return data, addr, now
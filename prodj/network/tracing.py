@@ -0,0 +1,78 @@
+import collections
+import logging
+import time
+
+from prodj.network import packets, packets_dump
+from prodj.network.capture import PacketRecorder
+
+# decoders for dumping traced packets by the default ports
+TraceDecoders = {
+  50000: (packets.KeepAlivePacket, packets_dump.dump_keepalive_packet),
+  50001: (packets.BeatPacket, packets_dump.dump_beat_packet),
+  50002: (packets.StatusPacket, packets_dump.dump_status_packet)
+}
+
+# bounded in-memory trace of the latest received datagrams, see ProDj.enable_tracing
+# only raw bytes and arrival times are stored, packets are decoded when dumping
+class PacketTrace:
+  def __init__(self, size=1000):
+    self.entries = collections.deque(maxlen=size)
+    self.dump_on_error = True # dump the trace when a packet can not be parsed
+    self.log_level = None # if set, every packet is decoded and logged immediately at this level
+    self.error_dump_interval = 5 # minimum seconds between two dumps by dump_error
+    self.recorded = 0 # total number of recorded packets
+    self.dumped = 0 # value of recorded at the last dump_error
+    self.last_error_dump = None
+
+  def __len__(self):
+    return len(self.entries)
+
+  def record(self, port, data, addr, timestamp):
+    self.entries.append((timestamp, port, data, addr))
+    self.recorded += 1
+    if self.log_level is not None:
+      self.dump_entry(timestamp, port, data, addr, self.log_level)
+
+  def clear(self):
+    self.entries.clear()
+
+  # log the latest count (default: all) traced packets, raw and decoded
+  def dump(self, level=logging.INFO, count=None):
+    entries = list(self.entries)
+    if count is not None:
+      entries = entries[max(len(entries)-count, 0):]
+    logging.log(level, "Packet trace of the latest %d packets:", len(entries))
+    for timestamp, port, data, addr in entries:
+      self.dump_entry(timestamp, port, data, addr, level)
+
+  # dumps the packets received since the last call, at most once per error_dump_interval
+  # thus a device sending malformed packets continuously does not flood the log
+  # returns False if the dump was skipped
+  def dump_error(self, level=logging.WARNING):
+    now = time.monotonic()
+    if self.last_error_dump is not None and now-self.last_error_dump < self.error_dump_interval:
+      return False
+    self.last_error_dump = now
+    count = min(self.recorded-self.dumped, len(self.entries))
+    self.dumped = self.recorded
+    self.dump(level, count)
+    return True
+
+  def dump_entry(self, timestamp, port, data, addr, level):
+    if not logging.getLogger().isEnabledFor(level):
+      return
+    logging.log(level, "%.6f port %d from %s, %d bytes: %s", timestamp, port, addr[0], len(data), data.hex(" "))
+    if port not in TraceDecoders:
+      return
+    struct, dump_function = TraceDecoders[port]
+    try:
+      dump_function(struct.parse(data), level)
+    except Exception as e:
+      logging.log(level, "  unable to decode: %s", str(e).split("\n")[0])
+
+  # write the trace to a capture file, which can be replayed by replay.py
+  def save(self, filename):
+    recorder = PacketRecorder(filename)
+    for timestamp, port, data, addr in self.entries:
+      recorder.record(port, data, addr, timestamp)
+    recorder.close()
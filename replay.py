@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+
+from prodj.core.prodj import ProDj
+from prodj.network.capture import PacketReplayer
+
+parser = argparse.ArgumentParser(description='Replay a Python ProDJ Link packet capture without network access')
+parser.add_argument('capture', help='Capture file, e.g. recorded with monitor-qt.py --record')
+parser.add_argument('-s', '--speed', type=float, default=1, help='Replay speed relative to the recording, 0 replays as fast as possible (default: 1)')
+parser.add_argument('-q', '--quiet', action='store_const', dest='loglevel', const=logging.WARNING, help='Display warning messages only', default=logging.INFO)
+parser.add_argument('-d', '--debug', action='store_const', dest='loglevel', const=logging.DEBUG, help='Display verbose debugging information')
+args = parser.parse_args()
+
+logging.basicConfig(level=args.loglevel, format='%(levelname)s: %(message)s')
+
+p = ProDj()
+p.auto_detect_iface = False # never send anything to the recorded players
+p.cl.log_played_tracks = False
+p.cl.auto_request_beatgrid = False
+
+replayer = PacketReplayer(p, args.capture, args.speed if args.speed > 0 else None)
+try:
+  replayer.replay()
+  logging.info("%d players known, %d repeated status packets skipped", len(p.cl), p.cl.status_packets_skipped)
+except KeyboardInterrupt:
+  logging.info("Shutting down...")
+finally:
+  p.data.stop()
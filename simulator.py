@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import random
+import time
+
+from prodj.core.simulator import NetworkSimulator, SimulatedModels
+
+parser = argparse.ArgumentParser(description='Simulate a ProDJ Link network of virtual players for testing without hardware')
+parser.add_argument('-n', '--players', type=int, default=4, help='Number of simulated players (default: 4)')
+parser.add_argument('-m', '--model', choices=list(SimulatedModels), default='CDJ-2000NXS2', help='Model of the simulated players (default: CDJ-2000NXS2)')
+parser.add_argument('-b', '--bpm', type=float, default=128, help='Tempo of the loaded tracks (default: 128)')
+parser.add_argument('-p', '--pitch', type=float, default=0, help='Pitch in percent (default: 0)')
+parser.add_argument('-t', '--target', default='127.0.0.1', help='Address to send packets to, may be a broadcast address (default: 127.0.0.1)')
+parser.add_argument('--base-ip', default='127.0.0.2', help='Address of the first player, must be assigned to a local interface (default: 127.0.0.2)')
+parser.add_argument('--duration', type=float, default=0, help='Stop after this many seconds, 0 runs until interrupted (default: 0)')
+parser.add_argument('--track-change', type=float, default=0, help='Load a new track on a random player every n seconds (default: never)')
+parser.add_argument('-q', '--quiet', action='store_const', dest='loglevel', const=logging.WARNING, help='Display warning messages only', default=logging.INFO)
+parser.add_argument('-d', '--debug', action='store_const', dest='loglevel', const=logging.DEBUG, help='Display verbose debugging information')
+args = parser.parse_args()
+
+logging.basicConfig(level=args.loglevel, format='%(levelname)s: %(message)s')
+
+sim = NetworkSimulator(args.target, args.base_ip)
+for i in range(args.players):
+  player = sim.add_player(args.model, args.bpm, 1+args.pitch/100)
+  player.load_track(i+1)
+  player.play()
+sim.players[0].master = True
+
+sim.start()
+try:
+  start = time.monotonic()
+  next_track_change = start+args.track_change
+  while args.duration == 0 or time.monotonic()-start < args.duration:
+    time.sleep(0.1)
+    if args.track_change > 0 and time.monotonic() >= next_track_change:
+      player = random.choice(sim.players)
+      player.load_track(player.track_id+len(sim.players))
+      player.play()
+      next_track_change += args.track_change
+except KeyboardInterrupt:
+  logging.info("Shutting down...")
+finally:
+  sim.stop()
@@ -0,0 +1,103 @@
+import time
+import unittest
+from unittest.mock import Mock
+
+from prodj.core.beats import BeatPhase, BeatTicker, predict_beat_time
+from prodj.core.clientlist import ClientList
+from prodj.network import packets, packets_fast
+from test_clientlist import build_keepalive
+
+def build_beat(player_number, next_beat, next_bar):
+    return packets.BeatPacket.build({
+        "type": "type_beat", "subtype": "stype_beat", "model": "CDJ-2000NXS2", "player_number": player_number,
+        "content": {
+            "distances": {"next_beat": next_beat, "2nd_beat": 2*next_beat, "next_bar": next_bar,
+                "4th_beat": 4*next_beat, "2nd_bar": min(next_bar+4*next_beat, 0xffffffff), "8th_beat": 8*next_beat},
+            "pitch": 1, "bpm": 120, "beat": 2, "player_number2": player_number}})
+
+class BeatPredictionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.prodj = Mock()
+        self.prodj.data.beatgrid_store = {}
+        self.cl = ClientList(self.prodj)
+        self.cl.log_played_tracks = False
+        self.cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(2, "10.0.0.2")))
+        self.client = self.cl.getClient(2)
+
+    def eat_beat(self, data, timestamp):
+        packet = packets_fast.parse_beat_packet(data)
+        packet.timestamp = timestamp
+        self.cl.eatBeat(packet)
+
+    def test_distances(self):
+        self.eat_beat(build_beat(2, 500, 1500), 10.0)
+        self.assertEqual(self.client.beat_phase.beat_time, 10.0)
+        self.assertEqual(self.client.beat_phase.beat_at(10.0), 2)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, now=10.1), 10.5)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, count=2, now=10.1), 11.0)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, bar=True, now=10.1), 11.5)
+        # beat packets lost, extrapolated from the last one
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, now=12.0), 12.5)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, bar=True, now=12.0), 13.5)
+        self.assertIsNone(predict_beat_time(self.prodj, self.client, now=20.0))
+
+    def test_end_of_track(self):
+        self.eat_beat(build_beat(2, 500, 0xffffffff), 10.0)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, now=10.1), 10.5)
+        self.assertIsNone(predict_beat_time(self.prodj, self.client, bar=True, now=10.1))
+
+    def test_beatgrid(self):
+        self.client.play_state = "playing"
+        self.client.loaded_player_number, self.client.loaded_slot, self.client.track_id = 2, "usb", 17
+        self.client.actual_pitch = 1
+        self.client.playhead.measure(1.2, 100.0)
+        self.client.playhead.set_pitch(1, 100.0)
+        self.prodj.data.beatgrid_store[2, "usb", 17] = [{"beat": x%4+1, "time": 500*x} for x in range(16)]
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, now=100.1), 100.3)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, bar=True, now=100.1), 100.8)
+        self.client.actual_pitch = 2
+        self.client.playhead.set_pitch(2, 100.0)
+        self.assertAlmostEqual(predict_beat_time(self.prodj, self.client, count=2, now=100.0), 100.4)
+
+    def test_jitter(self):
+        phase = BeatPhase()
+        phase.update(10.0, 0.5, 1.0)
+        phase.update(10.504, 0.5, 0.5) # delayed by the network
+        self.assertAlmostEqual(phase.beat_time, 10.501)
+        phase.update(10.999, 0.5, 2.0) # earlier than predicted
+        self.assertAlmostEqual(phase.beat_time, 10.999)
+        self.assertEqual(phase.beat_at(10.999), 1)
+        phase.update(20.0, 0.5, 2.0) # jumped
+        self.assertEqual(phase.beat_time, 20.0)
+        phase.update(20.5, None, None) # end of track
+        self.assertIsNone(phase.predict(20.6))
+
+class BeatTickerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.prodj = Mock()
+        self.prodj.data.beatgrid_store = {}
+        self.cl = ClientList(self.prodj)
+        self.cl.log_played_tracks = False
+        self.cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(2, "10.0.0.2")))
+        self.prodj.cl = self.cl
+        self.ticker = BeatTicker(self.prodj)
+        self.ticker.start()
+
+    def tearDown(self):
+        self.ticker.stop()
+        self.ticker.join()
+
+    def test_ticks(self):
+        ticks = []
+        packet = packets_fast.parse_beat_packet(build_beat(2, 40, 120))
+        packet.timestamp = time.monotonic()
+        self.cl.eatBeat(packet)
+        self.ticker.subscribe(lambda player_number, beat_time, beat: ticks.append((time.monotonic(), beat_time, beat)), 2)
+        time.sleep(0.15)
+        self.assertGreaterEqual(len(ticks), 3)
+        self.assertEqual([beat for _, _, beat in ticks[:3]], [3, 4, 1])
+        for fired, beat_time, _ in ticks:
+            self.assertAlmostEqual(fired, beat_time, delta=0.01)
+
+if __name__ == '__main__':
+    unittest.main()
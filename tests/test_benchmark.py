@@ -0,0 +1,30 @@
+import unittest
+
+from prodj.core.benchmark import Parsers, build_corpus, compare_results, run_benchmark
+
+class BenchmarkTestCase(unittest.TestCase):
+    def test_corpus(self):
+        corpus = build_corpus()
+        for name in ["status/CDJ-2000", "status/CDJ-2000NXS2", "status/CDJ-3000", "absolute_position/CDJ-3000",
+                "mixer/DJM-900nexus", "dbmessage", "rpc"]:
+            self.assertIn(name, corpus)
+        # every parser is used and every packet parses
+        used = set()
+        for name, (parser_names, datas) in corpus.items():
+            self.assertGreater(len(datas), 0, name)
+            for parser_name in parser_names:
+                used.add(parser_name)
+                for data in datas:
+                    Parsers[parser_name](data)
+        self.assertEqual(used, set(Parsers))
+
+    def test_run(self):
+        corpus = {"rpc": build_corpus()["rpc"]}
+        results = run_benchmark(corpus, min_time=0)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["parser"], "RpcMsg")
+        self.assertGreater(results[0]["packets_per_second"], 0)
+        self.assertEqual(compare_results(results, results), [("RpcMsg", "rpc", 1)])
+
+if __name__ == '__main__':
+    unittest.main()
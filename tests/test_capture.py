@@ -0,0 +1,31 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from prodj.network.capture import PacketRecorder, PacketReplayer, read_capture
+
+class CaptureTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_record_and_replay(self):
+        recorder = PacketRecorder(self.filename)
+        recorder.record(50000, b"keepalive", ("10.0.0.2", 50000), 100.0)
+        recorder.record(50002, b"status", ("10.0.0.3", 50002), 100.5)
+        recorder.close()
+
+        self.assertEqual(list(read_capture(self.filename)), [
+            (100.0, 50000, b"keepalive", ("10.0.0.2", 50000)),
+            (100.5, 50002, b"status", ("10.0.0.3", 50002))])
+
+        prodj = Mock()
+        count, elapsed = PacketReplayer(prodj, self.filename, speed=None).replay()
+        self.assertEqual(count, 2)
+        calls = prodj.handle_packet.call_args_list
+        self.assertEqual(calls[0][0][:3], (50000, b"keepalive", ("10.0.0.2", 50000)))
+        self.assertAlmostEqual(calls[1][0][3]-calls[0][0][3], 0.5)
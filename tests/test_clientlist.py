@@ -0,0 +1,154 @@
+import time
+import unittest
+from unittest.mock import Mock
+
+from prodj.core.clientlist import ClientList
+from prodj.core.playerstate import PlayerState, PlayState, SlotState
+from prodj.network import packets, packets_fast
+from test_packets_fast import build_cdj_status
+
+def build_keepalive(player_number, ip_addr):
+    return packets.KeepAlivePacket.build({
+        "type": "type_status", "subtype": "stype_status", "model": "CDJ-2000NXS2",
+        "content": {"player_number": player_number, "ip_addr": ip_addr, "mac_addr": "aa:bb:cc:dd:ee:0{}".format(player_number)}})
+
+class ClientListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.prodj = Mock()
+        self.prodj.data.beatgrid_store = {}
+        self.cl = ClientList(self.prodj)
+        self.cl.log_played_tracks = False
+        self.cl.auto_request_beatgrid = False
+        self.cl.client_change_callback = Mock()
+        self.cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(2, "10.0.0.2")))
+
+    def eat_status(self, data):
+        timestamp = time.monotonic()
+        if not self.cl.eatUnchangedStatus(data, timestamp):
+            packet = packets_fast.parse_status_packet(data)
+            packet.timestamp = timestamp
+            self.cl.eatStatus(packet, data)
+
+    def test_unchanged_status_is_skipped(self):
+        data = build_cdj_status(packet_count=1)
+        self.eat_status(data)
+        self.assertEqual(self.cl.getClient(2).bpm, 128)
+        self.assertEqual(self.cl.client_change_callback.call_count, 1)
+
+        # only the packet counter changed
+        self.eat_status(build_cdj_status(packet_count=2))
+        self.assertEqual(self.cl.status_packets_skipped, 1)
+
+        self.eat_status(build_cdj_status(packet_count=3, bpm=130))
+        self.assertEqual(self.cl.status_packets_skipped, 1)
+        self.assertEqual(self.cl.getClient(2).bpm, 130)
+        self.assertEqual(self.cl.client_change_callback.call_count, 2)
+
+    def test_batch_notifies_once(self):
+        self.cl.beginBatch()
+        for bpm in [120, 121, 122]:
+            self.eat_status(build_cdj_status(bpm=bpm))
+        self.cl.client_change_callback.assert_not_called()
+        self.cl.endBatch()
+        self.cl.client_change_callback.assert_called_once_with(2)
+        self.assertEqual(self.cl.getClient(2).bpm, 122)
+
+    def test_indexes(self):
+        c = self.cl.getClient(2)
+        self.assertIs(self.cl.getClientByIp("10.0.0.2"), c)
+        self.eat_status(build_cdj_status(track_id=123))
+        self.assertEqual(list(self.cl.clientsByLoadedTrack(2, "usb", 123)), [c])
+        self.eat_status(build_cdj_status(track_id=124))
+        self.assertEqual(list(self.cl.clientsByLoadedTrack(2, "usb", 123)), [])
+        self.assertEqual(list(self.cl.clientsByLoadedTrack(2, "usb", 124)), [c])
+        self.cl.storeMetadataByLoadedTrack(2, "usb", 124, {"artwork_id": 7})
+        self.assertIsNone(self.cl.snapshot.getClient(2).metadata) # applied by the ingest thread
+        self.cl.gc()
+        self.assertEqual(self.cl.snapshot.getClient(2).metadata, {"artwork_id": 7})
+        self.assertEqual(list(self.cl.clientsByLoadedTrackArtwork(2, "usb", 7)), [c])
+
+        # renumbering
+        self.cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(3, "10.0.0.2")))
+        self.assertIsNone(self.cl.getClient(2))
+        self.assertIs(self.cl.getClient(3), c)
+
+        # timeout
+        expired = Mock()
+        self.cl.subscribeChanges(expired, ["expired"])
+        t = c.ttl
+        self.cl.gc(t+4)
+        self.assertEqual(len(self.cl), 1)
+        c.ttl = t+3 # packet received, the deadline is moved when the old one passes
+        self.cl.gc(t+5)
+        self.assertEqual(len(self.cl), 1)
+        expired.assert_not_called()
+        self.cl.gc(t+8)
+        expired.assert_called_once_with(3, {"expired": (False, True)})
+        self.assertEqual(len(self.cl.expiry_queue), 0)
+        self.assertEqual(len(self.cl), 0)
+        self.assertIsNone(self.cl.getClient(3))
+        self.assertIsNone(self.cl.getClientByIp("10.0.0.2"))
+        self.assertEqual(self.cl.clients_by_track, {})
+
+    def test_change_events(self):
+        all_changes, bpm_changes, other_player = Mock(), Mock(), Mock()
+        self.cl.subscribeChanges(all_changes)
+        self.cl.subscribeChanges(bpm_changes, ["bpm", "actual_pitch"], master=True)
+        self.cl.subscribeChanges(other_player, player_number=3)
+        self.eat_status(build_cdj_status(bpm=128))
+        changes = all_changes.call_args[0][1]
+        self.assertEqual(changes["bpm"], (None, 128))
+        self.assertEqual(changes["track_id"], (0, 123))
+        bpm_changes.assert_called_once_with(2, {"bpm": (None, 128)})
+
+        # only the beat changed
+        self.eat_status(build_cdj_status(bpm=128, beat=3, beat_count=11))
+        all_changes.assert_called_with(2, {"beat": (2, 3), "beat_count": (10, 11)})
+        self.assertEqual(bpm_changes.call_count, 1)
+
+        # changes within a batch are merged, reverted changes are dropped
+        self.cl.beginBatch()
+        self.eat_status(build_cdj_status(bpm=129, beat=3, beat_count=11))
+        self.eat_status(build_cdj_status(bpm=130, beat=3, beat_count=11, actual_pitch=1.5))
+        self.eat_status(build_cdj_status(bpm=130, beat=3, beat_count=11))
+        self.cl.endBatch()
+        bpm_changes.assert_called_with(2, {"bpm": (128, 130)})
+        other_player.assert_not_called()
+
+    def test_typed_state(self):
+        self.eat_status(build_cdj_status())
+        c = self.cl.getClient(2)
+        self.assertIs(c.play_state, PlayState.playing)
+        self.assertEqual(c.play_state, "playing")
+        self.assertIs(c.usb_state, SlotState.not_loaded)
+        self.assertEqual(c.state, PlayerState.master | PlayerState.play)
+        self.assertIn("master", c.state)
+        self.assertNotIn("sync", c.state)
+        self.assertEqual(str(c.state), "master,play")
+        with self.assertRaises(AttributeError):
+            c.unknown_field = 1
+
+        snapshot = c.copy()
+        self.eat_status(build_cdj_status(bpm=130, state={"sync": True}))
+        self.assertEqual(snapshot.bpm, 128)
+        self.assertEqual(snapshot.state, PlayerState.master | PlayerState.play)
+        self.assertEqual(c.state, PlayerState.sync)
+
+    def test_snapshot(self):
+        self.cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(3, "10.0.0.3")))
+        self.eat_status(build_cdj_status(bpm=128))
+        snapshot = self.cl.snapshot
+        self.assertEqual([c.player_number for c in snapshot], [2, 3])
+        self.assertEqual(snapshot.getClient(2).bpm, 128)
+        self.assertEqual(snapshot.getMaster().player_number, 2)
+        with self.assertRaises(AttributeError):
+            snapshot.getClient(2).bpm = 1
+
+        self.eat_status(build_cdj_status(bpm=130))
+        self.assertEqual(snapshot.getClient(2).bpm, 128) # old snapshots stay unchanged
+        self.assertEqual(self.cl.snapshot.getClient(2).bpm, 130)
+        self.assertIs(self.cl.snapshot.getClient(3), snapshot.getClient(3)) # unchanged clients are not copied
+
+        self.cl.removeClient(self.cl.getClient(3))
+        self.assertIsNone(self.cl.snapshot.getClient(3))
+        self.assertEqual(len(self.cl.snapshot), 1)
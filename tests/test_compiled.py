@@ -0,0 +1,42 @@
+import unittest
+
+from prodj.core import compiled
+from prodj.core.benchmark import Parsers, build_corpus
+from prodj.pdblib.page import AlignedPage
+
+class CompiledModeTestCase(unittest.TestCase):
+    def tearDown(self):
+        compiled.set_compiled_mode(False)
+
+    def parse_all(self, corpus):
+        results = []
+        for name, (parser_names, datas) in corpus.items():
+            for parser_name in parser_names:
+                if parser_name.startswith("fast."): # not construct based
+                    continue
+                for data in datas:
+                    results.append((name, parser_name, Parsers[parser_name](data)))
+        for blob in ["tests/blobs/pdb_artists_common.bin", "tests/blobs/pdb_artists_strange_string.bin"]:
+            with open(blob, "rb") as f:
+                results.append((blob, "AlignedPage", AlignedPage.parse_stream(f)))
+        return results
+
+    def test_conformance(self):
+        corpus = build_corpus()
+        interpreted = self.parse_all(corpus)
+        compiled.set_compiled_mode(True)
+        for name in ["KeepAlivePacket", "BeatPacket", "StatusPacket", "DBMessage", "IpAddr", "Pitch"]:
+            self.assertIn(("prodj.network.packets", name), compiled.compiled_structs)
+        self.assertIn(("prodj.network.packets_nfs", "RpcMsg"), compiled.compiled_structs)
+        self.assertIn(("prodj.pdblib.usbanlz", "AnlzTag"), compiled.compiled_structs)
+        for (name, parser_name, expected), (_, _, result) in zip(interpreted, self.parse_all(corpus)):
+            self.assertEqual(result, expected, "{} {}".format(name, parser_name))
+
+    def test_switch_back(self):
+        compiled.set_compiled_mode(True)
+        compiled.set_compiled_mode(False)
+        for struct, compiled_struct in compiled.compiled_structs.values():
+            self.assertNotIn("_parse", vars(struct))
+
+if __name__ == '__main__':
+    unittest.main()
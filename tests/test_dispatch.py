@@ -0,0 +1,88 @@
+import threading
+import unittest
+
+from prodj.core.clientlist import urgent_changes
+from prodj.core.dispatch import CallbackDispatcher, merge_changes
+
+class DispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.blocked = threading.Event()
+        self.release = threading.Event()
+
+    def slow_callback(self, *args):
+        self.calls += [args]
+        self.blocked.set()
+        self.release.wait(5)
+
+    # blocks the dispatcher in the first call, so further calls are queued
+    def start_blocked(self, **kwargs):
+        dispatcher = CallbackDispatcher(self.slow_callback, **kwargs)
+        dispatcher.start()
+        self.addCleanup(dispatcher.join)
+        self.addCleanup(dispatcher.stop)
+        self.addCleanup(self.release.set)
+        dispatcher(0)
+        self.assertTrue(self.blocked.wait(5))
+        return dispatcher
+
+    def finish(self, dispatcher):
+        done = threading.Event()
+        dispatcher.callback = lambda *args: (self.calls.append(args), done.set() if args == ("end",) else None)
+        dispatcher("end")
+        self.release.set()
+        self.assertTrue(done.wait(5))
+
+    def test_drop_oldest(self):
+        dispatcher = self.start_blocked(size=2)
+        for i in range(1, 5):
+            dispatcher(i)
+        self.assertEqual(dispatcher.pending()[0], 2)
+        self.finish(dispatcher)
+        self.assertEqual(self.calls, [(0,), (4,), ("end",)])
+        self.assertEqual(dispatcher.dropped, 3)
+        self.assertEqual(dispatcher.stats()["lag"]["count"], 3)
+
+    def test_coalesce(self):
+        dispatcher = self.start_blocked(size=4, policy="coalesce", merge=merge_changes)
+        dispatcher(2, {"bpm": (120, 121)})
+        dispatcher(3, {"bpm": (100, 101)})
+        dispatcher(2, {"bpm": (121, 122), "beat": (1, 2)})
+        self.finish(dispatcher)
+        self.assertEqual(self.calls[1:], [(2, {"bpm": (120, 122), "beat": (1, 2)}), (3, {"bpm": (100, 101)}), ("end",)])
+        self.assertEqual(dispatcher.coalesced, 1)
+        self.assertEqual(dispatcher.dropped, 0)
+
+    def test_max_rate(self):
+        # not started, calls are taken at given times of the clock
+        dispatcher = CallbackDispatcher(print, policy="coalesce", merge=merge_changes, max_rate=10, urgent=urgent_changes)
+        dispatcher.clock = lambda: 0
+        dispatcher(2, {"bpm": (120, 121)})
+        self.assertEqual(dispatcher.take(0.0), (((2, {"bpm": (120, 121)}), 0), None))
+        dispatcher(2, {"bpm": (121, 122)})
+        dispatcher(2, {"bpm": (122, 123)})
+        call, wait = dispatcher.take(0.05)
+        self.assertIsNone(call)
+        self.assertAlmostEqual(wait, 0.05)
+        dispatcher(2, {"track_id": (1, 2)}) # urgent, delivered without waiting
+        call, _ = dispatcher.take(0.05)
+        self.assertEqual(call[0], (2, {"bpm": (121, 123), "track_id": (1, 2)}))
+        self.assertEqual(dispatcher.coalesced, 2)
+
+        dispatcher(2, {"bpm": (123, 124)})
+        dispatcher(3, {"bpm": (100, 101)}) # other players are limited separately
+        self.assertEqual(dispatcher.take(0.06)[0][0], (3, {"bpm": (100, 101)}))
+        call, wait = dispatcher.take(0.06)
+        self.assertIsNone(call)
+        self.assertAlmostEqual(wait, 0.09)
+        self.assertEqual(dispatcher.take(0.16)[0][0], (2, {"bpm": (123, 124)}))
+        self.assertEqual(dispatcher.take(1.0), (None, None))
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            CallbackDispatcher(print, policy="block")
+        with self.assertRaises(ValueError):
+            CallbackDispatcher(print, max_rate=10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+from prodj.core.clientlist import ClientList
+from prodj.core.journal import PlayedTracksJournal
+from prodj.network import packets_fast
+from test_clientlist import build_keepalive
+from test_packets_fast import build_cdj_status
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "tracks.db")
+        self.journal = PlayedTracksJournal(self.filename)
+        self.journal.flush_interval = 0.01
+
+    def entry(self, timestamp, player_number, title):
+        return {"time": timestamp, "network": "", "player_number": player_number, "loaded_player_number": 2,
+            "loaded_slot": "usb", "track_id": 123, "on_air": True, "artist_id": 1, "album_id": 2, "artwork_id": 3,
+            "title": title, "artist": "Artist", "album": "Album", "duration": 300}
+
+    def test_query(self):
+        now = time.time()
+        self.journal.record(self.entry(now-7200, 2, "old"))
+        self.journal.record(self.entry(now-60, 3, "new"))
+        self.assertEqual([e["title"] for e in self.journal.recent(3600)], ["new"]) # from the buffer
+        self.journal.start()
+        self.journal.stop()
+        self.journal.join()
+        self.assertEqual(self.journal.written, 2)
+        self.assertEqual([e["title"] for e in self.journal.recent(3600)], ["new"]) # from the database
+        self.assertEqual([e["title"] for e in self.journal.query()], ["old", "new"])
+        self.assertEqual([e["title"] for e in self.journal.query(player_number=2)], ["old"])
+        # the database is kept
+        self.assertEqual(len(PlayedTracksJournal(self.filename).query()), 2)
+
+    def test_client_list(self):
+        prodj = Mock()
+        prodj.network_name = "eth1"
+        prodj.data.beatgrid_store = {}
+        prodj.record_played_track = self.journal.record
+        prodj.data.get_metadata.side_effect = lambda player, slot, track_id, callback: \
+            callback("metadata", player, slot, track_id, {"title": "Title", "artist": "Artist", "artist_id": 4})
+        cl = ClientList(prodj)
+        cl.auto_request_beatgrid = False
+        cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(2, "10.0.0.2")))
+        packet = packets_fast.parse_status_packet(build_cdj_status())
+        packet.timestamp = time.monotonic()
+        cl.eatStatus(packet)
+        for written in [False, True]: # from the buffer and from the database
+            entry, = self.journal.recent()
+            self.assertEqual((entry["player_number"], entry["track_id"], entry["title"], entry["artist_id"]), (2, 123, "Title", 4))
+            self.assertEqual(entry["network"], "eth1")
+            self.assertIsNone(entry["album"])
+            if not written:
+                self.journal.start()
+                self.journal.stop()
+                self.journal.join()
+                self.assertEqual(self.journal.written, 1)
+
+    def test_record_while_writing(self):
+        now = time.time()
+        write = self.journal.write
+        def write_and_record(db, entries):
+            if entries[0]["title"] == "first":
+                self.assertEqual([e["title"] for e in self.journal.query()], ["first"]) # batch in flight
+            write(db, entries)
+            if entries[0]["title"] == "first":
+                self.journal.record(self.entry(now, 2, "second")) # before the batch is finished
+        self.journal.write = write_and_record
+        self.journal.record(self.entry(now-1, 2, "first"))
+        self.journal.start()
+        self.journal.stop()
+        self.journal.join()
+        self.assertEqual(self.journal.written, 2)
+        self.assertEqual(self.journal.buffer, [])
+        self.assertEqual([e["title"] for e in PlayedTracksJournal(self.filename).query()], ["first", "second"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from prodj.network import packets, packets_fast
+
+def strip_io(obj):
+    if isinstance(obj, (dict, packets_fast.PacketView)):
+        return {key: strip_io(value) for key, value in obj.items() if key != "_io"}
+    if isinstance(obj, list):
+        return [strip_io(value) for value in obj]
+    return obj
+
+def build_cdj_status(**kwargs):
+    content = {
+        "loaded_player_number": 2, "loaded_slot": "usb", "track_analyze_type": "rekordbox",
+        "track_id": 123, "track_number": 4, "activity": 1, "firmware": "1.00",
+        "state": {"master": True, "play": True}, "play_state": "playing", "play_state2": 0xfa,
+        "play_state3": 9, "physical_pitch": 1, "actual_pitch": 1, "physical_pitch2": 1,
+        "actual_pitch2": 1, "bpm": 128, "beat_count": 10, "beat": 2
+    }
+    content.update(kwargs)
+    return packets.StatusPacket.build({
+        "type": "cdj", "model": "CDJ-2000NXS2", "player_number": 2,
+        "extra": {"remaining_bytes": 0xb0}, "content": content})
+
+class PacketsFastTestCase(unittest.TestCase):
+    def assertSameParse(self, reference, decoder, data):
+        expected = strip_io(reference.parse(data))
+        decoded = decoder(data)
+        self.assertIsNotNone(decoded)
+        self.assertEqual(strip_io(decoded), expected)
+        self.assertEqual(list(decoded.keys()), list(expected.keys()))
+
+    def test_lazy_decoding(self):
+        packet = packets_fast.decode_status_packet(build_cdj_status(bpm=120))
+        self.assertNotIn("bpm", packet.content.__dict__)
+        self.assertEqual(packet.content.bpm, 120)
+        self.assertIn("bpm", packet.content.__dict__)
+        self.assertIn("beat_count", packet.content)
+        self.assertNotIn("key", packet.content)
+        self.assertEqual(packet.content["track_id"], 123)
+        with self.assertRaises(AttributeError):
+            packet.content.key
+
+    def test_keepalive_packets(self):
+        for packet_type in ["status", "ip"]:
+            data = packets.KeepAlivePacket.build({
+                "type": "type_"+packet_type, "subtype": "stype_"+packet_type, "model": "CDJ-2000",
+                "content": {"player_number": 2, "ip_addr": "1.2.3.4", "mac_addr": "aa:bb:cc:dd:ee:ff", "iteration": 1}})
+            self.assertSameParse(packets.KeepAlivePacket, packets_fast.decode_keepalive_packet, data)
+
+    def test_beat_packets(self):
+        data = packets.BeatPacket.build({
+            "type": "type_beat", "subtype": "stype_beat", "model": "CDJ-2000", "player_number": 3,
+            "content": {
+                "distances": {"next_beat": 1, "2nd_beat": 2, "next_bar": 3, "4th_beat": 4, "2nd_bar": 5, "8th_beat": 6},
+                "pitch": 1, "bpm": 128, "beat": 3, "player_number2": 3}})
+        self.assertSameParse(packets.BeatPacket, packets_fast.decode_beat_packet, data)
+
+        data = packets.BeatPacket.build({
+            "type": "type_mixer", "subtype": "stype_mixer", "model": "DJM-900nexus", "player_number": 33,
+            "content": {"ch_on_air": [1, 0, 1, 0]}})
+        self.assertSameParse(packets.BeatPacket, packets_fast.decode_beat_packet, data)
+
+    def test_status_packets(self):
+        data = build_cdj_status()
+        self.assertSameParse(packets.StatusPacket, packets_fast.decode_status_packet, data)
+
+        # cdj-3000 layout with key and loop fields
+        data = bytearray(data + bytes(1158-len(data)))
+        data[34:36] = (0x438).to_bytes(2, "big")
+        data[348:352] = (0x03000001).to_bytes(4, "big")
+        data[356:364] = (0xFFFFFFFFFFFFFF9C).to_bytes(8, "big")
+        data[440:444] = (1000).to_bytes(4, "big")
+        self.assertSameParse(packets.StatusPacket, packets_fast.decode_status_packet, bytes(data))
+        self.assertEqual(packets_fast.decode_status_packet(bytes(data)).content.keyshift, "minus1")
+
+        data = packets.StatusPacket.build({
+            "type": "djm", "model": "DJM-900nexus", "player_number": 33, "extra": {"remaining_bytes": 0x14},
+            "content": {"state": {"master": True}, "physical_pitch": 1, "bpm": 128, "beat": 1}})
+        self.assertSameParse(packets.StatusPacket, packets_fast.decode_status_packet, data)
+
+    def test_fallback(self):
+        data = packets.StatusPacket.build({
+            "type": "link_query", "model": "Virtual CDJ", "player_number": 5,
+            "extra": {"source_ip": "1.2.3.4"}, "content": {"remote_player_number": 2, "slot": 3}})
+        self.assertIsNone(packets_fast.decode_status_packet(data))
+        self.assertEqual(packets_fast.parse_status_packet(data).content.remote_player_number, 2)
+        self.assertIsNone(packets_fast.decode_status_packet(build_cdj_status()[:100]))
@@ -0,0 +1,52 @@
+import time
+import unittest
+
+from prodj.core.pipeline import PacketPipeline
+from prodj.core.prodj import ProDj
+from test_clientlist import build_keepalive
+from test_packets_fast import build_cdj_status
+
+class PipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.prodj = ProDj()
+        self.prodj.auto_detect_iface = False
+        self.prodj.cl.log_played_tracks = False
+        self.prodj.cl.auto_request_beatgrid = False
+        self.prodj.gc_interval = 0.01
+
+    def tearDown(self):
+        self.prodj.data.stop()
+        self.prodj.nfs.loop.close()
+
+    def test_overflow_and_processing(self):
+        pipeline = PacketPipeline(self.prodj, size=2)
+        self.prodj.pipeline = pipeline
+        changed = []
+        self.prodj.set_client_change_callback(changed.append)
+
+        now = time.monotonic()
+        self.prodj.handle_packet(50000, build_keepalive(2, "10.0.0.2"), ("10.0.0.2", 50000), now)
+        self.prodj.handle_packet(50002, build_cdj_status(bpm=130), ("10.0.0.2", 50002), now)
+        with self.assertLogs(level="WARNING"):
+            self.prodj.handle_packet(50002, build_cdj_status(bpm=131), ("10.0.0.2", 50002), now)
+        # nothing is applied by the receiving thread
+        self.assertIsNone(self.prodj.cl.getClient(2))
+        self.assertEqual(pipeline.enqueued, 2)
+        self.assertEqual(pipeline.dropped, 1)
+
+        pipeline.start()
+        try:
+            deadline = time.monotonic()+2
+            while pipeline.queue.qsize() > 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            pipeline.stop()
+            pipeline.join()
+        self.assertEqual(self.prodj.cl.getClient(2).bpm, 130)
+        self.assertEqual(changed, [2]) # applied as one batch
+        stats = pipeline.stats()
+        self.assertEqual(stats["process_latency"]["count"], 2)
+        self.assertEqual(stats["notify_latency"]["count"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
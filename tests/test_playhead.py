@@ -0,0 +1,54 @@
+import random
+import unittest
+from unittest.mock import Mock
+
+from prodj.core.clientlist import ClientList
+from prodj.core.playhead import Playhead
+from prodj.network import packets, packets_fast
+from test_clientlist import build_keepalive
+
+def build_absolute_position(player_number, position, pitch=1):
+    return packets.BeatPacket.build({
+        "type": "type_absolute_position", "subtype": 0x18, "model": "CDJ-3000", "player_number": player_number,
+        "content": {"track_len": 300, "playhead": round(position*1000), "pitch": round(pitch*100), "bpm": 1200}})
+
+class PlayheadTestCase(unittest.TestCase):
+    def test_drift(self):
+        # the clock of the player runs 0.1% faster, packets arrive with up to 3 ms network jitter
+        random.seed(1)
+        playhead = Playhead()
+        playhead.set_pitch(1, 0)
+        for i in range(1000):
+            t = i*0.03
+            playhead.measure(round(t*1.001, 3), t+random.uniform(0, 0.003))
+        self.assertAlmostEqual(playhead.drift, 0.001, delta=0.0003)
+        self.assertAlmostEqual(playhead.position_at(30.0), 30.03, delta=0.003)
+
+    def test_jump(self):
+        playhead = Playhead()
+        self.assertIsNone(playhead.position_at(1.0))
+        playhead.measure(10.0, 1.0)
+        playhead.set_pitch(1, 1.0)
+        self.assertAlmostEqual(playhead.position_at(2.0), 11.0)
+        playhead.measure(11.1, 2.0) # small error is smoothed
+        self.assertAlmostEqual(playhead.position_at(2.0), 11.05)
+        playhead.measure(60.0, 3.0) # jump to a cue point is applied directly
+        self.assertEqual(playhead.position_at(3.0), 60.0)
+        playhead.set_pitch(0, 4.0) # paused
+        self.assertAlmostEqual(playhead.position_at(10.0), 61.0)
+
+    def test_client_list(self):
+        prodj = Mock()
+        cl = ClientList(prodj)
+        cl.log_played_tracks = False
+        cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(2, "10.0.0.3")))
+        for i in range(3):
+            packet = packets_fast.parse_beat_packet(build_absolute_position(2, 5+i*0.03))
+            packet.timestamp = 10+i*0.03
+            cl.eatBeat(packet)
+        c = cl.snapshot.getClient(2)
+        self.assertAlmostEqual(c.position, 5.06)
+        self.assertAlmostEqual(c.playhead.position_at(10.56), 5.56)
+
+if __name__ == '__main__':
+    unittest.main()
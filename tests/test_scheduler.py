@@ -0,0 +1,42 @@
+import time
+import unittest
+
+from prodj.core.scheduler import CommandScheduler
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((time.monotonic(), data, addr))
+
+class CommandSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = CommandScheduler()
+        self.scheduler.start()
+        self.sock = FakeSocket()
+
+    def tearDown(self):
+        self.scheduler.stop()
+        self.scheduler.join()
+
+    def test_send_order_and_time(self):
+        now = time.monotonic()
+        self.scheduler.schedule(now+0.06, self.sock, b"second", ("10.0.0.2", 50002))
+        self.scheduler.schedule(now+0.03, self.sock, b"first", ("10.0.0.2", 50002))
+        cancelled = self.scheduler.schedule(now+0.04, self.sock, b"cancelled", ("10.0.0.2", 50002))
+        self.assertTrue(self.scheduler.cancel(cancelled))
+        self.assertFalse(self.scheduler.cancel(cancelled))
+        time.sleep(0.1)
+        self.assertEqual([data for _, data, _ in self.sock.sent], [b"first", b"second"])
+        self.assertGreaterEqual(self.sock.sent[0][0], now+0.03)
+        self.assertLess(self.sock.sent[0][0], now+0.05)
+
+    def test_drop_late(self):
+        self.scheduler.schedule(time.monotonic()-1, self.sock, b"late", ("10.0.0.2", 50002))
+        time.sleep(0.02)
+        self.assertEqual(self.sock.sent, [])
+        self.assertEqual(self.scheduler.missed, 1)
+
+if __name__ == '__main__':
+    unittest.main()
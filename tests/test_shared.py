@@ -0,0 +1,84 @@
+import unittest
+
+from prodj.core.prodj import ProDj
+from prodj.core.shared import SharedResources
+from prodj.data.datastore import DataStore, DataStoreView
+from prodj.network.ip import broadcast_address, get_iface_data
+
+class DataStoreViewTestCase(unittest.TestCase):
+    def setUp(self):
+        self.store = DataStore()
+        self.a = DataStoreView(self.store, "eth1")
+        self.b = DataStoreView(self.store, "eth2")
+
+    def tearDown(self):
+        self.store.stop()
+
+    def test_namespaces(self):
+        self.a[2, "usb", 17] = "a"
+        self.b[2, "usb", 17] = "b"
+        self.assertIn((2, "usb", 17), self.a)
+        self.assertNotIn((3, "usb", 17), self.a)
+        self.assertEqual(self.a[2, "usb", 17], "a")
+        self.assertEqual(self.b[2, "usb", 17], "b")
+        self.assertEqual(len(self.store), 2)
+
+    def test_remove_by_player_slot(self):
+        self.a[2, "usb", 17] = "a"
+        self.a[2, "sd", 17] = "a"
+        self.b[2, "usb", 17] = "b"
+        self.a.removeByPlayerSlot(2, "usb")
+        self.assertNotIn((2, "usb", 17), self.a)
+        self.assertIn((2, "sd", 17), self.a)
+        self.assertIn((2, "usb", 17), self.b)
+
+class SharedResourcesTestCase(unittest.TestCase):
+    def test_instances(self):
+        shared = SharedResources()
+        a = ProDj(shared=shared)
+        b = ProDj(iface="lo", shared=shared)
+        try:
+            self.assertIs(a.nfs.loop, shared.loop)
+            self.assertIs(b.nfs.loop, shared.loop)
+            self.assertIsNot(a.cl, b.cl)
+            self.assertIs(a.data.metadata_store.store, b.data.metadata_store.store)
+            self.assertIs(a.data.pdb.dbs.store, b.data.pdb.dbs.store)
+            self.assertEqual(b.own_ip[1], "127.0.0.1")
+            self.assertFalse(b.auto_detect_iface)
+            self.assertEqual(b.network_name, "lo")
+            self.assertNotEqual(b.name, "") # thread name is kept
+            self.assertEqual(a.data.metadata_store.store.size_limit, 2*shared.store_limits["metadata"])
+        finally:
+            a.data.stop()
+            b.data.stop()
+            shared.close()
+
+    def test_loop_refcount(self):
+        shared = SharedResources()
+        shared.acquire()
+        shared.acquire()
+        shared.release()
+        self.assertTrue(shared.loop.is_running() or shared.loop_thread.is_alive())
+        shared.release()
+        self.assertIsNone(shared.loop_thread)
+        shared.close()
+
+class IfaceTestCase(unittest.TestCase):
+    def test_get_iface_data(self):
+        self.assertEqual(get_iface_data("lo")[1:3], ("127.0.0.1", "255.0.0.0"))
+        self.assertIsNone(get_iface_data("nonexistent0"))
+        self.assertEqual(broadcast_address("169.254.12.34", "255.255.0.0"), "169.254.255.255")
+
+    def test_unknown_iface(self):
+        prodj = ProDj()
+        try:
+            with self.assertRaises(ValueError):
+                prodj.set_interface("nonexistent0")
+            self.assertIsNone(prodj.iface)
+            self.assertTrue(prodj.auto_detect_iface)
+        finally:
+            prodj.data.stop()
+            prodj.nfs.loop.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from prodj.core.simulator import SimulatedPlayer
+from prodj.network import packets_fast
+
+class SimulatorTestCase(unittest.TestCase):
+    def simulate(self, model, duration=2):
+        player = SimulatedPlayer(2, "127.0.0.3", model, bpm=120)
+        sent = []
+        player.send = lambda data, port: sent.append((port, data))
+        player.load_track(42)
+        player.play()
+        now = 0
+        while now < duration:
+            player.update(now)
+            now += 0.01
+        return sent
+
+    def test_packets_parse(self):
+        for model in ["CDJ-2000", "CDJ-2000NXS2", "CDJ-3000"]:
+            sent = self.simulate(model)
+            ports = [port for port, data in sent]
+            self.assertIn(50000, ports)
+            self.assertGreaterEqual(ports.count(50001), 3) # 2 beats per second at 120 bpm
+            for port, data in sent:
+                if port == 50000:
+                    packet = packets_fast.parse_keepalive_packet(data)
+                    self.assertEqual(packet.content.ip_addr, "127.0.0.3")
+                elif port == 50001:
+                    packet = packets_fast.parse_beat_packet(data)
+                    if packet.type == "type_beat":
+                        self.assertEqual(packet.content.bpm, 120)
+                else:
+                    packet = packets_fast.parse_status_packet(data)
+                    self.assertEqual(packet.model, model)
+                    self.assertEqual(packet.content.track_id, 42)
+
+    def test_absolute_position(self):
+        sent = self.simulate("CDJ-3000")
+        positions = [packets_fast.parse_beat_packet(data) for port, data in sent if port == 50001]
+        positions = [p.content.playhead for p in positions if p.type == "type_absolute_position"]
+        self.assertGreater(len(positions), 20)
+        self.assertEqual(positions, sorted(positions))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import math
+import unittest
+from unittest.mock import Mock
+
+from prodj.core.clientlist import ClientList
+from prodj.network import packets_fast
+from test_clientlist import build_keepalive
+from test_packets_fast import build_cdj_status
+
+try:
+    import numpy
+    from prodj.core.telemetry import TelemetryBuffer
+except ImportError:
+    numpy = None
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class TelemetryTestCase(unittest.TestCase):
+    def test_ring_buffer(self):
+        buffer = TelemetryBuffer(size=8)
+        for i in range(20):
+            buffer.append(float(i), 128, 1+i/100, i/2, i)
+        self.assertEqual(len(buffer), 7)
+        rows = buffer.samples()
+        self.assertEqual(list(rows[:, 0]), [float(i) for i in range(13, 20)])
+        self.assertEqual(len(buffer.samples(duration=2, now=19)), 3)
+        self.assertAlmostEqual(buffer.mean_tempo(duration=2, now=19), 128*1.18)
+        self.assertAlmostEqual(buffer.pitch_change_rate(), 0.01)
+        self.assertAlmostEqual(buffer.beat_rate(), 60)
+
+    def test_unknown_values(self):
+        buffer = TelemetryBuffer(size=8)
+        self.assertTrue(math.isnan(buffer.mean_tempo()))
+        buffer.append(1.0, "-", 1, None, None)
+        buffer.append(2.0, 120, 1, None, None)
+        self.assertEqual(buffer.mean_tempo(), 120)
+        self.assertTrue(math.isnan(buffer.pitch_change_rate(duration=0.5, now=2.0)))
+
+    def test_client_list(self):
+        prodj = Mock()
+        prodj.data.beatgrid_store = {}
+        cl = ClientList(prodj)
+        cl.log_played_tracks = False
+        cl.auto_request_beatgrid = False
+        cl.telemetry_size = 16
+        cl.eatKeepalive(packets_fast.parse_keepalive_packet(build_keepalive(2, "10.0.0.2")))
+        for i in range(3):
+            packet = packets_fast.parse_status_packet(build_cdj_status(bpm=120+i, packet_count=i))
+            packet.timestamp = float(i)
+            cl.eatStatus(packet)
+        rows = cl.getClient(2).telemetry.samples()
+        self.assertEqual(list(rows[:, 1]), [120, 121, 122])
+
+if __name__ == '__main__':
+    unittest.main()
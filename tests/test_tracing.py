@@ -0,0 +1,67 @@
+import logging
+import os
+import tempfile
+import unittest
+
+from prodj.core.prodj import ProDj
+from prodj.network.capture import read_capture
+from test_clientlist import build_keepalive
+from test_packets_fast import build_cdj_status
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.prodj = ProDj()
+        self.prodj.auto_detect_iface = False
+        self.prodj.cl.log_played_tracks = False
+        self.prodj.cl.auto_request_beatgrid = False
+
+    def tearDown(self):
+        self.prodj.data.stop()
+        self.prodj.nfs.loop.close()
+
+    def test_disabled(self):
+        self.prodj.handle_packet(50000, build_keepalive(2, "10.0.0.2"), ("10.0.0.2", 50000), 1.0)
+        self.assertIsNone(self.prodj.trace)
+
+    def test_ring_buffer(self):
+        self.prodj.enable_tracing(size=3)
+        self.prodj.handle_packet(50000, build_keepalive(2, "10.0.0.2"), ("10.0.0.2", 50000), 1.0)
+        for i in range(3):
+            self.prodj.handle_packet(50002, build_cdj_status(packet_count=i), ("10.0.0.2", 50002), 2.0+i)
+        self.assertEqual(len(self.prodj.trace), 3)
+        self.assertEqual([entry[0] for entry in self.prodj.trace.entries], [2.0, 3.0, 4.0])
+
+        with self.assertLogs(level=logging.INFO) as logs:
+            self.prodj.trace.dump(count=1)
+        self.assertIn("latest 1 packets", logs.output[0])
+        self.assertIn("cdj", logs.output[2]) # decoded status packet
+
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.prodj.trace.save(filename)
+            self.assertEqual(len(list(read_capture(filename))), 3)
+        finally:
+            os.remove(filename)
+
+        self.prodj.disable_tracing()
+        self.assertIsNone(self.prodj.trace)
+
+    def test_dump_on_error(self):
+        self.prodj.enable_tracing()
+        self.prodj.handle_packet(50000, build_keepalive(2, "10.0.0.2"), ("10.0.0.2", 50000), 1.0)
+        with self.assertLogs(level=logging.WARNING) as logs:
+            self.prodj.handle_packet(50001, b"garbage", ("10.0.0.2", 50001), 2.0)
+        self.assertIn("Failed to parse beat packet", logs.output[0])
+        self.assertIn("latest 2 packets", logs.output[1])
+        self.assertTrue(any("67 61 72 62 61 67 65" in line for line in logs.output))
+        # further errors only dump new packets and are rate limited
+        self.assertFalse(self.prodj.trace.dump_error())
+        self.prodj.handle_packet(50000, build_keepalive(2, "10.0.0.2"), ("10.0.0.2", 50000), 3.0)
+        self.prodj.trace.last_error_dump = None
+        with self.assertLogs(level=logging.WARNING) as logs:
+            self.assertTrue(self.prodj.trace.dump_error())
+        self.assertIn("latest 1 packets", logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()